@@ -0,0 +1,41 @@
+"""add unique user email
+
+Revision ID: 0c7d95e3a1f6
+Revises: f2a8c4d61b37
+Create Date: 2026-10-19 02:48:10.226347
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c7d95e3a1f6'
+down_revision: Union[str, None] = 'f2a8c4d61b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # the other hot-path lookups are covered by the composite indexes of
+    # 3b9d41c7e2a5 (books), f2a8c4d61b37 (reviews) and 5e0b8f27a9d3 (booktag)
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT email FROM users GROUP BY email HAVING count(*) > 1 LIMIT 10"
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            f"users.email has duplicates, resolve them before upgrading: {duplicates}"
+        )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_users_email', 'users', ['email'], unique=True,
+            postgresql_concurrently=True, if_not_exists=True
+        )
+    op.execute("ALTER TABLE users ADD CONSTRAINT uq_users_email UNIQUE USING INDEX uq_users_email")
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_users_email', 'users', type_='unique')
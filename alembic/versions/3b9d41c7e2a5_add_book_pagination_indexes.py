@@ -0,0 +1,46 @@
+"""add book pagination indexes
+
+Revision ID: 3b9d41c7e2a5
+Revises: 57ae4ae7dab7
+Create Date: 2026-10-18 19:40:12.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d41c7e2a5'
+down_revision: Union[str, None] = '57ae4ae7dab7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BOOK_INDEXES = {
+    'ix_books_created_at_uid': ['created_at', 'uid'],
+    'ix_books_title_uid': ['title', 'uid'],
+    'ix_books_published_date_uid': ['published_date', 'uid'],
+    'ix_books_page_count_uid': ['page_count', 'uid'],
+    'ix_books_user_uid_created_at_uid': ['user_uid', 'created_at', 'uid'],
+}
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, columns in BOOK_INDEXES.items():
+            op.create_index(
+                name, 'books', columns,
+                postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in BOOK_INDEXES:
+            op.drop_index(
+                name, table_name='books',
+                postgresql_concurrently=True, if_exists=True
+            )
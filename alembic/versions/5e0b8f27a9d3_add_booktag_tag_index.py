@@ -0,0 +1,34 @@
+"""add booktag tag index
+
+Revision ID: 5e0b8f27a9d3
+Revises: d47a1e93b0c6
+Create Date: 2026-10-18 23:12:48.107362
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e0b8f27a9d3'
+down_revision: Union[str, None] = 'd47a1e93b0c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_booktag_tag_id_book_id', 'booktag', ['tag_id', 'book_id'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_booktag_tag_id_book_id', table_name='booktag',
+            postgresql_concurrently=True, if_exists=True
+        )
@@ -0,0 +1,50 @@
+"""add unique tag name
+
+Revision ID: a61c5d2f8e94
+Revises: 5e0b8f27a9d3
+Create Date: 2026-10-19 00:05:41.736815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a61c5d2f8e94'
+down_revision: Union[str, None] = '5e0b8f27a9d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # merge duplicate tags into the oldest one before the constraint goes on
+    op.execute(
+        "CREATE TEMPORARY TABLE tag_merge AS "
+        "SELECT uid, first_value(uid) OVER ("
+        "PARTITION BY name ORDER BY created_at NULLS LAST, uid"
+        ") AS keep_uid FROM tags"
+    )
+    op.execute("DELETE FROM tag_merge WHERE uid = keep_uid")
+    op.execute(
+        "INSERT INTO booktag (book_id, tag_id) "
+        "SELECT booktag.book_id, tag_merge.keep_uid FROM booktag "
+        "JOIN tag_merge ON tag_merge.uid = booktag.tag_id "
+        "ON CONFLICT DO NOTHING"
+    )
+    op.execute("DELETE FROM booktag USING tag_merge WHERE booktag.tag_id = tag_merge.uid")
+    op.execute("DELETE FROM tags USING tag_merge WHERE tags.uid = tag_merge.uid")
+    op.execute("DROP TABLE tag_merge")
+
+    # build the index without blocking writes, then promote it to the constraint
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_tags_name', 'tags', ['name'], unique=True,
+            postgresql_concurrently=True, if_not_exists=True
+        )
+    op.execute("ALTER TABLE tags ADD CONSTRAINT uq_tags_name UNIQUE USING INDEX uq_tags_name")
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_tags_name', 'tags', type_='unique')
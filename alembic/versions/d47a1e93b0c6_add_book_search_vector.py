@@ -0,0 +1,44 @@
+"""add book search vector
+
+Revision ID: d47a1e93b0c6
+Revises: 8c2f6e0d14b7
+Create Date: 2026-10-18 22:31:07.554920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd47a1e93b0c6'
+down_revision: Union[str, None] = '8c2f6e0d14b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # stored generated column: Postgres keeps it current on every insert/update
+    op.execute(
+        "ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(author, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(publisher, '')), 'C')"
+        ") STORED"
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_books_search_vector', 'books', ['search_vector'],
+            postgresql_using='gin', postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_books_search_vector', table_name='books',
+            postgresql_concurrently=True, if_exists=True
+        )
+    op.drop_column('books', 'search_vector')
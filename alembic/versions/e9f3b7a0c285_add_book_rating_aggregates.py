@@ -0,0 +1,51 @@
+"""add book rating aggregates
+
+Revision ID: e9f3b7a0c285
+Revises: a61c5d2f8e94
+Create Date: 2026-10-19 01:18:26.904513
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9f3b7a0c285'
+down_revision: Union[str, None] = 'a61c5d2f8e94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COUNT_COLUMNS = [
+    'rating_count', 'rating_sum',
+    'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+]
+
+
+def upgrade() -> None:
+    # constant defaults: no table rewrite; fill them with `python -m src.reviews.ratings`
+    for name in COUNT_COLUMNS:
+        op.add_column('books', sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+    # the prior mean when this revision was written; migrations must not follow settings
+    op.add_column(
+        'books',
+        sa.Column('rating_score', sa.Float(), nullable=False, server_default='3.0')
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_books_rating_score_uid', 'books', ['rating_score', 'uid'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_books_rating_score_uid', table_name='books',
+            postgresql_concurrently=True, if_exists=True
+        )
+    op.drop_column('books', 'rating_score')
+    for name in reversed(COUNT_COLUMNS):
+        op.drop_column('books', name)
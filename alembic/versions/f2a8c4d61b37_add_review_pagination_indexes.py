@@ -0,0 +1,44 @@
+"""add review pagination indexes
+
+Revision ID: f2a8c4d61b37
+Revises: e9f3b7a0c285
+Create Date: 2026-10-19 02:07:53.481926
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a8c4d61b37'
+down_revision: Union[str, None] = 'e9f3b7a0c285'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+REVIEW_INDEXES = {
+    'ix_reviews_book_uid_created_at_uid': ['book_uid', 'created_at', 'uid'],
+    'ix_reviews_book_uid_rating_uid': ['book_uid', 'rating', 'uid'],
+    'ix_reviews_user_uid_created_at_uid': ['user_uid', 'created_at', 'uid'],
+    'ix_reviews_user_uid_rating_uid': ['user_uid', 'rating', 'uid'],
+}
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, columns in REVIEW_INDEXES.items():
+            op.create_index(
+                name, 'reviews', columns,
+                postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in REVIEW_INDEXES:
+            op.drop_index(
+                name, table_name='reviews',
+                postgresql_concurrently=True, if_exists=True
+            )
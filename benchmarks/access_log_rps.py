@@ -0,0 +1,101 @@
+"""Requests per second with access logging off, inline, queued and sampled.
+
+Drives a minimal app that has the project's middleware stack and a single
+route that does no I/O, in-process through httpx, so the numbers show only
+what the logging costs per request:
+
+- off: ACCESS_LOG_ENABLED=false
+- inline: the JSON formatter and a stream handler called on the event loop
+- queue: the QueueHandler/listener thread from src.logs
+- sampled: the queue, logging ACCESS_LOG_SAMPLE_RATE of successful requests
+
+Log lines go to --log-file (a real file includes the cost of writing it).
+
+    python -m benchmarks.access_log_rps --requests 20000 --concurrency 50
+    python -m benchmarks.access_log_rps --log-file /tmp/access.log --sample-rate 0.05
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from src.config import Config
+from src.logs import JsonFormatter, logger, start_logging, stop_logging
+from src.middleware import register_middleware
+
+MODES = ["off", "inline", "queue", "sampled"]
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    register_middleware(app)
+
+    @app.get("/ping/{item}")
+    async def ping(item: int):
+        return {"item": item}
+
+    return app
+
+
+async def drive(app: FastAPI, requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    remaining = iter(range(requests))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+        async def worker():
+            for i in remaining:
+                response = await client.get(f"/ping/{i}")
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+        return requests / (time.perf_counter() - started)
+
+
+def run(mode: str, requests: int, concurrency: int, log_file: str, sample_rate: float) -> float:
+    Config.ACCESS_LOG_ENABLED = mode != "off"
+    Config.ACCESS_LOG_SAMPLE_RATE = sample_rate if mode == "sampled" else 1.0
+
+    with open(log_file, "a") as stream:
+        if mode == "inline":
+            handler = logging.StreamHandler(stream)
+            handler.setFormatter(JsonFormatter())
+            logger.handlers = [handler]
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+        elif mode in ("queue", "sampled"):
+            start_logging(stream)
+
+        try:
+            # the first requests warm up pydantic and the route table
+            asyncio.run(drive(build_app(), min(requests, 500), concurrency))
+            return asyncio.run(drive(build_app(), requests, concurrency))
+        finally:
+            # drains the queue, after the timed run
+            stop_logging()
+            logger.handlers = []
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--log-file", default=os.devnull)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    args = parser.parse_args()
+
+    baseline = None
+    for mode in args.modes:
+        rps = run(mode, args.requests, args.concurrency, args.log_file, args.sample_rate)
+        baseline = baseline or rps
+        print(f"{mode:<8} {rps:9.0f} req/s   {rps / baseline:6.1%} of {args.modes[0]}")
+
+
+if __name__ == "__main__":
+    main()
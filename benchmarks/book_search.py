@@ -0,0 +1,135 @@
+"""Full-text search vs. fetching the whole catalogue and filtering in Python.
+
+Seeds a synthetic catalogue into the database at DATABASE_URL (use a scratch
+database), then times BookService.search_books against loading every book
+and filtering client-side, which is what clients did before /books/search.
+
+    python -m benchmarks.book_search --books 200000
+    python -m benchmarks.book_search --no-seed --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy.orm import raiseload
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.books.importer import BookImporter
+from src.books.service import BookService
+from src.db.main import async_engine
+from src.db.models import Book, User
+
+WORDS = (
+    "dune river shadow empire glass winter garden machine ocean silent "
+    "crown forest signal harbor ember archive orbit lantern desert storm "
+    "atlas cipher echo meridian north paper quiet relic saga tide"
+).split()
+
+QUERIES = ["dune", "silent ocean", "empire -winter", "\"glass garden\"", "lantern"]
+
+
+def synthetic_rows(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield json.dumps({
+            "title": " ".join(rng.sample(WORDS, 3)).title(),
+            "author": f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}",
+            "publisher": f"{rng.choice(WORDS).title()} Press",
+            "published_date": f"{rng.randint(1900, 2024)}-01-01",
+            "page_count": rng.randint(50, 900),
+            "language": "en",
+        }) + "\n"
+
+
+async def seed(count: int) -> None:
+    async with async_engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        user = User(
+            username="bench", email=f"bench-{uuid.uuid4()}@example.com",
+            first_name="bench", last_name="bench", password_hash="-", role="user",
+        )
+        session.add(user)
+        await session.commit()
+
+        async def chunks():
+            batch = []
+            for row in synthetic_rows(count):
+                batch.append(row)
+                if len(batch) == 10000:
+                    yield "".join(batch).encode()
+                    batch = []
+            if batch:
+                yield "".join(batch).encode()
+
+        started = time.perf_counter()
+        report = await BookImporter().import_stream(chunks(), "ndjson", str(user.uid), session)
+        print(f"seeded {report['inserted']} books in {time.perf_counter() - started:.1f}s")
+
+
+async def timed(func, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def run(repeat: int) -> None:
+    service = BookService()
+
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        for query in QUERIES:
+            async def search():
+                return await service.search_books(query, session, limit=20)
+
+            async def fetch_and_filter():
+                result = await session.execute(
+                    select(Book).options(raiseload(Book.reviews), raiseload(Book.tags))
+                )
+                terms = [t.strip('"-') for t in query.split() if not t.startswith("-")]
+                matches = [
+                    book for book in result.scalars().all()
+                    if all(
+                        term in f"{book.title} {book.author} {book.publisher}".lower()
+                        for term in terms
+                    )
+                ]
+                session.expunge_all()
+                return matches[:20]
+
+            search_ms = await timed(search, repeat)
+            scan_ms = await timed(fetch_and_filter, max(1, repeat // 5))
+
+            print(
+                f"{query!r:<20} search p50 {statistics.median(search_ms):8.2f} ms   "
+                f"fetch+filter p50 {statistics.median(scan_ms):9.2f} ms"
+            )
+
+    await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--no-seed", action="store_true")
+    args = parser.parse_args()
+
+    async def go():
+        if not args.no_seed:
+            await seed(args.books)
+        await run(args.repeat)
+
+    asyncio.run(go())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""Load test of the running API: latency percentiles and throughput per endpoint.
+
+Starts the app with uvicorn against the database at DATABASE_URL and the
+local Redis (use a scratch database migrated to head), optionally seeds it
+with the data set from benchmarks.query_plans, and adds verified users with
+a known password to log in as. Each scenario then runs on its own for
+--duration seconds with --concurrency clients looping over it:
+
+- browse: the first pages of GET /books, following next_cursor
+- detail: GET /books/{book_uid} for random books
+- login: POST /auth/login, which is bcrypt bound
+- review: POST /reviews/book/{book_uid}
+- tagging: POST /tags/book/{book_uid}/tags
+
+p50/p95/p99 latency and throughput of the successful requests, and the
+errors, per endpoint (by route template) go to --output as JSON, together
+with the git commit and the settings, so runs on two commits can be
+compared with benchmarks.loadtest_compare.
+
+    python -m benchmarks.loadtest --seed --users 2000 --books 50000 --reviews 200000
+    python -m benchmarks.loadtest --scenarios browse detail --concurrency 64 --output after.json
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000   # a server already running
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+from sqlalchemy import func
+from sqlmodel import select
+
+from benchmarks.query_plans import copy, seed
+from src.auth.utils import generate_passwd_hash
+from src.db.main import async_engine
+from src.db.models import Book, Tag
+
+API = "/api/v1"
+PASSWORD = "load-test-password"
+SCENARIOS = ["browse", "detail", "login", "review", "tagging"]
+BROWSE_PAGES = 3
+
+
+class Recorder:
+    """Latencies of successful responses and failures per endpoint label
+
+    Failed requests are only counted: a fast 500 or a timed out connection
+    would otherwise pull the percentiles either way.
+    """
+
+    def __init__(self) -> None:
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[label] += 1
+            return None
+
+        if response.status_code >= 400:
+            self.errors[label] += 1
+            return None
+
+        self.latencies[label].append(time.perf_counter() - started)
+
+        return response
+
+
+def percentile(ordered: list, q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+
+    for label in sorted(set(recorder.latencies) | set(recorder.errors)):
+        ordered = sorted(recorder.latencies[label]) or [0.0]
+        succeeded = len(recorder.latencies[label])
+        errors = recorder.errors[label]
+        endpoints[label] = {
+            "requests": succeeded + errors,
+            "errors": errors,
+            "error_rate": round(errors / (succeeded + errors), 4),
+            "throughput_rps": round(succeeded / elapsed, 1),
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        }
+
+    return endpoints
+
+
+async def seed_login_users(count: int) -> list:
+    """Verified users sharing one password; hashed once, bcrypt is slow"""
+
+    password_hash = generate_passwd_hash(PASSWORD)
+    run = uuid.uuid4().hex[:8]
+    now = datetime.now()
+    emails = [f"load{i}-{run}@example.com" for i in range(count)]
+
+    await copy(
+        "users",
+        ["uid", "username", "email", "first_name", "last_name", "role",
+         "is_verified", "password_hash", "created_at", "updated_at"],
+        [(uuid.uuid4(), f"load{i}-{run}", email, "load", "test", "user", True,
+          password_hash, now, now) for i, email in enumerate(emails)],
+    )
+
+    return emails
+
+
+async def pick_targets(sample_size: int) -> dict:
+    async with async_engine.connect() as conn:
+        result = await conn.execute(select(Book.uid).order_by(func.random()).limit(sample_size))
+        book_uids = [str(uid) for uid in result.scalars()]
+
+        result = await conn.execute(select(Tag.name).limit(200))
+        tag_names = list(result.scalars()) or ["load-test"]
+
+    if not book_uids:
+        raise SystemExit("no books in the database: run with --seed")
+
+    return {"book_uids": book_uids, "tag_names": tag_names}
+
+
+async def browse(client, recorder, targets, rng, headers):
+    cursor = None
+    for _ in range(BROWSE_PAGES):
+        params = {"limit": 20, **({"cursor": cursor} if cursor else {})}
+        response = await recorder.request(
+            client, "GET /books/", "GET", f"{API}/books/", params=params, headers=headers
+        )
+        cursor = response.json().get("next_cursor") if response is not None else None
+        if cursor is None:
+            break
+
+
+async def detail(client, recorder, targets, rng, headers):
+    book_uid = rng.choice(targets["book_uids"])
+    await recorder.request(
+        client, "GET /books/{book_uid}", "GET", f"{API}/books/{book_uid}", headers=headers
+    )
+
+
+async def login(client, recorder, targets, rng, headers):
+    await recorder.request(
+        client, "POST /auth/login", "POST", f"{API}/auth/login",
+        json={"email": rng.choice(targets["emails"]), "password": PASSWORD},
+    )
+
+
+async def review(client, recorder, targets, rng, headers):
+    book_uid = rng.choice(targets["book_uids"])
+    await recorder.request(
+        client, "POST /reviews/book/{book_uid}", "POST", f"{API}/reviews/book/{book_uid}",
+        json={"rating": rng.randint(1, 5), "review_text": "Read it in one sitting."},
+        headers=headers,
+    )
+
+
+async def tagging(client, recorder, targets, rng, headers):
+    book_uid = rng.choice(targets["book_uids"])
+    names = rng.sample(targets["tag_names"], min(3, len(targets["tag_names"])))
+    await recorder.request(
+        client, "POST /tags/book/{book_uid}/tags", "POST", f"{API}/tags/book/{book_uid}/tags",
+        json={"tags": [{"name": name} for name in names]},
+        headers=headers,
+    )
+
+
+SCENARIO_STEPS = {
+    "browse": browse, "detail": detail, "login": login, "review": review, "tagging": tagging,
+}
+
+
+async def log_in(client: httpx.AsyncClient, email: str) -> str:
+    response = await client.post(f"{API}/auth/login", json={"email": email, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_scenario(name: str, url: str, targets: dict, concurrency: int, duration: float) -> dict:
+    step = SCENARIO_STEPS[name]
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        # one token per client, spread over the seeded users
+        tokens = await asyncio.gather(*[
+            log_in(client, targets["emails"][i % len(targets["emails"])])
+            for i in range(min(concurrency, len(targets["emails"])))
+        ])
+
+        async def worker(index: int, deadline: float):
+            rng = random.Random(index)
+            headers = {"Authorization": f"Bearer {tokens[index % len(tokens)]}"}
+            while time.perf_counter() < deadline:
+                await step(client, recorder, targets, rng, headers)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker(i, started + duration) for i in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    return summarize(recorder, elapsed)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env={**os.environ, "ACCESS_LOG_ENABLED": "false"},
+    )
+
+
+async def wait_until_ready(url: str, timeout: float = 60) -> None:
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/metrics")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+
+    raise SystemExit(f"the server at {url} did not come up")
+
+
+async def run(args) -> dict:
+    if args.seed:
+        await seed(args.users, args.books, args.reviews)
+
+    targets = await pick_targets(args.sample_books)
+    targets["emails"] = await seed_login_users(args.login_users)
+    await async_engine.dispose()
+
+    url = args.url or f"http://127.0.0.1:{args.port}"
+    server = None if args.url else start_server(args.port, args.workers)
+
+    try:
+        await wait_until_ready(url)
+
+        scenarios = {}
+        for name in args.scenarios:
+            scenarios[name] = await run_scenario(name, url, targets, args.concurrency, args.duration)
+
+            for label, stats in scenarios[name].items():
+                print(
+                    f"{name:<8} {label:<32} {stats['throughput_rps']:8.1f} req/s   "
+                    f"p50 {stats['p50_ms']:8.2f}   p95 {stats['p95_ms']:8.2f}   "
+                    f"p99 {stats['p99_ms']:8.2f} ms   errors {stats['errors']}"
+                )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    return {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "settings": {
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "workers": None if args.url else args.workers,
+            "url": url,
+        },
+        "scenarios": scenarios,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="test a server that is already running instead")
+    parser.add_argument("--seed", action="store_true")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--books", type=int, default=50000)
+    parser.add_argument("--reviews", type=int, default=200000)
+    parser.add_argument("--login-users", type=int, default=100)
+    parser.add_argument("--sample-books", type=int, default=1000)
+    parser.add_argument("--output", default="loadtest.json")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Compare two benchmarks.loadtest result files, e.g. from two commits.
+
+Prints the change in throughput, p50/p95/p99 latency and error rate per
+scenario and endpoint, and exits with status 1 when any endpoint's p95 got
+slower, or its throughput lower, by more than --threshold percent, when its
+error rate rose by more than --error-threshold percentage points, or when
+it is missing from the second run (so it can gate CI).
+
+    git checkout main && python -m benchmarks.loadtest --output before.json
+    git checkout my-branch && python -m benchmarks.loadtest --output after.json
+    python -m benchmarks.loadtest_compare before.json after.json --threshold 10
+"""
+import argparse
+import json
+
+METRICS = ["throughput_rps", "p50_ms", "p95_ms", "p99_ms"]
+
+
+def change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+
+def error_rate(stats: dict) -> float:
+    # results written before error_rate was recorded
+    if "error_rate" in stats:
+        return stats["error_rate"]
+
+    return stats["errors"] / stats["requests"] if stats["requests"] else 0.0
+
+
+def compare(before: dict, after: dict, threshold: float, error_threshold: float = 1.0) -> list:
+    """Print the table; return the regressions beyond the thresholds"""
+
+    regressions = []
+
+    print(f"before {before['commit'][:12]}   after {after['commit'][:12]}")
+
+    for scenario, endpoints in after["scenarios"].items():
+        for label, new in endpoints.items():
+            old = before["scenarios"].get(scenario, {}).get(label)
+
+            if old is None:
+                print(f"{scenario:<8} {label:<32} only in the second run")
+                continue
+
+            deltas = {metric: change(old[metric], new[metric]) for metric in METRICS}
+            old_errors, new_errors = error_rate(old) * 100, error_rate(new) * 100
+            print(
+                f"{scenario:<8} {label:<32} "
+                + "   ".join(
+                    f"{metric} {old[metric]:.1f} -> {new[metric]:.1f} ({deltas[metric]:+.1f}%)"
+                    for metric in METRICS
+                )
+                + f"   errors {old_errors:.2f}% -> {new_errors:.2f}%"
+            )
+
+            if (
+                deltas["p95_ms"] > threshold
+                or -deltas["throughput_rps"] > threshold
+                or new_errors - old_errors > error_threshold
+            ):
+                regressions.append(f"{scenario} {label}")
+
+    for scenario, endpoints in before["scenarios"].items():
+        for label in endpoints:
+            if label not in after["scenarios"].get(scenario, {}):
+                print(f"{scenario:<8} {label:<32} missing from the second run")
+                regressions.append(f"{scenario} {label} (missing)")
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10, help="percent")
+    parser.add_argument(
+        "--error-threshold", type=float, default=1, help="percentage points of error rate"
+    )
+    args = parser.parse_args()
+
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+
+    regressions = compare(before, after, args.threshold, args.error_threshold)
+
+    if regressions:
+        raise SystemExit(f"regressed: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
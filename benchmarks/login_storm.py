@@ -0,0 +1,96 @@
+"""Event-loop latency during a login storm.
+
+Fires a burst of password verifications at once, either inline on the event
+loop (how login_users used to call bcrypt) or through the bounded hash
+executor in src.auth.utils, while a ticker coroutine records how late the
+loop wakes it up. Needs the usual .env so that src.config can load.
+
+    python -m benchmarks.login_storm --logins 64 --rounds 12
+    python -m benchmarks.login_storm --calibrate 250
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from src.auth import utils
+from src.errors import ServerBusy
+
+TICK = 0.005
+
+
+async def ticker(lags: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def storm(mode: str, logins: int, password: str, hash: str) -> dict:
+    async def login():
+        if mode == "inline":
+            return utils.verify_password(password, hash)
+        return await utils.verify_password_async(password, hash)
+
+    lags = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(TICK * 2)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[login() for _ in range(logins)], return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await tick_task
+
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+
+    return {
+        "mode": mode,
+        "accepted": sum(1 for r in results if r is True),
+        "rejected": sum(1 for r in results if isinstance(r, ServerBusy)),
+        "elapsed_s": round(elapsed, 3),
+        "loop_lag_p50_ms": round(statistics.median(lags_ms), 2),
+        "loop_lag_p99_ms": round(lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))], 2),
+        "loop_lag_max_ms": round(lags_ms[-1], 2),
+    }
+
+
+def calibrate(budget_ms: float) -> int:
+    """Highest bcrypt cost whose single hash fits in the latency budget"""
+
+    rounds = 4
+    while rounds < 31:
+        context = utils.passwd_context.copy(bcrypt__rounds=rounds + 1)
+        started = time.perf_counter()
+        context.hash("calibration-password")
+        if (time.perf_counter() - started) * 1000 > budget_ms:
+            break
+        rounds += 1
+
+    return rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--calibrate", type=float, metavar="BUDGET_MS")
+    args = parser.parse_args()
+
+    if args.calibrate:
+        print(f"BCRYPT_ROUNDS={calibrate(args.calibrate)}")
+        return
+
+    password = "correct horse battery staple"
+    hash = utils.passwd_context.copy(bcrypt__rounds=args.rounds).hash(password)
+
+    for mode in ("inline", "pool"):
+        print(asyncio.run(storm(mode, args.logins, password, hash)))
+
+    utils.shutdown_hash_executor()
+
+
+if __name__ == "__main__":
+    main()
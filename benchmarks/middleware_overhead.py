@@ -0,0 +1,148 @@
+"""Throughput of the request middleware: @app.middleware('http') versus plain ASGI.
+
+Builds two copies of a minimal app with a JSON route and a streaming route:
+
+- before: timing/logging, read-your-writes and query-stats middleware as
+  @app.middleware('http') functions (Starlette's BaseHTTPMiddleware), as
+  src/middleware.py had them
+- after: the ASGI classes src.middleware.register_middleware installs
+
+Both get CORS and TrustedHost on top and are driven in-process through
+httpx, so the numbers show the cost of the middleware alone. The access log
+is disabled in both.
+
+    python -m benchmarks.middleware_overhead --requests 20000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from fastapi.responses import StreamingResponse
+
+from src.config import Config
+from src.db.main import track_queries
+from src.logs import new_request_id, request_id
+from src.metrics import REQUEST_DURATION, REQUESTS, REQUESTS_IN_PROGRESS, route_template
+from src.middleware import (
+    ObserveRequestsMiddleware,
+    QueryStatsMiddleware,
+    ReadYourWritesMiddleware,
+)
+
+
+def register_http_middleware(app: FastAPI) -> None:
+    """The middleware stack before, trimmed to what a GET request runs"""
+
+    @app.middleware('http')
+    async def observe_requests(request: Request, call_next):
+        method = request.method
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        token = request_id.set(new_request_id(request.headers.get("X-Request-ID")))
+        started = time.perf_counter()
+        status_code = 500
+
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            response.headers["X-Request-ID"] = request_id.get()
+            return response
+        finally:
+            duration = time.perf_counter() - started
+            in_progress.dec()
+            route = route_template(request.scope)
+            REQUEST_DURATION.labels(method, route).observe(duration)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            request_id.reset(token)
+
+    @app.middleware('http')
+    async def read_your_writes(request: Request, call_next):
+        return await call_next(request)
+
+    @app.middleware('http')
+    async def query_stats_headers(request: Request, call_next):
+        with track_queries() as stats:
+            response = await call_next(request)
+
+        response.headers["X-Query-Count"] = str(stats.count)
+        response.headers["X-Query-Time"] = f"{stats.duration * 1000:.2f}ms"
+        return response
+
+
+def register_asgi_middleware(app: FastAPI) -> None:
+    app.add_middleware(QueryStatsMiddleware)
+    app.add_middleware(ReadYourWritesMiddleware)
+    app.add_middleware(ObserveRequestsMiddleware)
+
+
+def build_app(variant: str) -> FastAPI:
+    app = FastAPI()
+
+    if variant == "before":
+        register_http_middleware(app)
+    else:
+        register_asgi_middleware(app)
+
+    app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+    app.add_middleware(TrustedHostMiddleware, allowed_hosts=["localhost"])
+
+    @app.get("/ping/{item}")
+    async def ping(item: int):
+        return {"item": item}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(10):
+                yield b"x" * 1024
+
+        return StreamingResponse(chunks(), media_type="application/octet-stream")
+
+    return app
+
+
+async def drive(app: FastAPI, paths, requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    remaining = iter(range(requests))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+        async def worker():
+            for i in remaining:
+                response = await client.get(paths(i))
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+        return requests / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    Config.ACCESS_LOG_ENABLED = False
+
+    routes = {"json": lambda i: f"/ping/{i}", "stream": lambda i: "/stream"}
+
+    for name, paths in routes.items():
+        results = {}
+        for variant in ("before", "after"):
+            app = build_app(variant)
+            asyncio.run(drive(app, paths, min(args.requests, 500), args.concurrency))
+            results[variant] = asyncio.run(drive(app, paths, args.requests, args.concurrency))
+
+        print(
+            f"{name:<7} before {results['before']:8.0f} req/s   after {results['after']:8.0f} req/s"
+            f"   {results['after'] / results['before'] - 1:+.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
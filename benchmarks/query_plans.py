@@ -0,0 +1,305 @@
+"""Query plans and latency of the service hot paths, without and with the indexes.
+
+Seeds users, books, tags and reviews into the database at DATABASE_URL (use a
+scratch database migrated to head), then runs every read the *Service
+classes issue on the request path twice:
+
+- before: the secondary indexes and unique constraints are dropped inside
+  a transaction, which is rolled back afterwards
+- after: the schema as migrated
+
+For each query the EXPLAIN (ANALYZE, BUFFERS) plan of every SQL statement
+the service method executed is recorded next to the method's median latency.
+The response cache is disabled so each call reaches the database.
+
+    python -m benchmarks.query_plans --users 20000 --books 200000 --reviews 1000000
+    python -m benchmarks.query_plans --no-seed --repeat 50 --output plans.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.auth.service import UserService
+from src.books.service import BookService
+from src.config import Config
+from src.db.main import async_engine
+from src.db.models import Review, Tag, User
+from src.reviews.service import ReviewService
+from src.tags.service import TagService
+
+# everything the hot-path migrations added, in reverse: the "before" schema
+DROP_HOT_PATH_INDEXES = [
+    "ALTER TABLE users DROP CONSTRAINT IF EXISTS uq_users_email",
+    "ALTER TABLE tags DROP CONSTRAINT IF EXISTS uq_tags_name",
+    "DROP INDEX IF EXISTS ix_books_created_at_uid",
+    "DROP INDEX IF EXISTS ix_books_title_uid",
+    "DROP INDEX IF EXISTS ix_books_published_date_uid",
+    "DROP INDEX IF EXISTS ix_books_page_count_uid",
+    "DROP INDEX IF EXISTS ix_books_rating_score_uid",
+    "DROP INDEX IF EXISTS ix_books_user_uid_created_at_uid",
+    "DROP INDEX IF EXISTS ix_books_search_vector",
+    "DROP INDEX IF EXISTS ix_booktag_tag_id_book_id",
+    "DROP INDEX IF EXISTS ix_reviews_book_uid_created_at_uid",
+    "DROP INDEX IF EXISTS ix_reviews_book_uid_rating_uid",
+    "DROP INDEX IF EXISTS ix_reviews_user_uid_created_at_uid",
+    "DROP INDEX IF EXISTS ix_reviews_user_uid_rating_uid",
+]
+
+SEED_BATCH_SIZE = 50000
+TAG_COUNT = 200
+WORDS = (
+    "dune river shadow empire glass winter garden machine ocean silent "
+    "crown forest signal harbor ember archive orbit lantern desert storm"
+).split()
+
+
+async def copy(table: str, columns: list, records) -> None:
+    async with async_engine.begin() as conn:
+        raw_connection = await conn.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            table, records=records, columns=columns
+        )
+
+
+def batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == SEED_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def seed(users: int, books: int, reviews: int, seed: int = 11) -> None:
+    rng = random.Random(seed)
+    now = datetime.now()
+    started = time.perf_counter()
+
+    def moment():
+        return now - timedelta(seconds=rng.randint(0, 3 * 365 * 86400))
+
+    user_uids = [uuid.uuid4() for _ in range(users)]
+    run = uuid.uuid4().hex[:8]
+    for batch in batches(
+        (uid, f"user{i}-{run}", f"user{i}-{run}@example.com", "bench", "bench",
+         "user", True, "-", moment(), now)
+        for i, uid in enumerate(user_uids)
+    ):
+        await copy(
+            "users",
+            ["uid", "username", "email", "first_name", "last_name", "role",
+             "is_verified", "password_hash", "created_at", "updated_at"],
+            batch,
+        )
+
+    tag_uids = [uuid.uuid4() for _ in range(TAG_COUNT)]
+    await copy(
+        "tags", ["uid", "name", "created_at"],
+        [(uid, f"tag{i}-{run}", now) for i, uid in enumerate(tag_uids)],
+    )
+
+    book_uids = [uuid.uuid4() for _ in range(books)]
+    for batch in batches(
+        (uid, " ".join(rng.sample(WORDS, 3)).title(), rng.choice(WORDS).title(),
+         f"{rng.choice(WORDS).title()} Press", date(rng.randint(1900, 2024), 1, 1),
+         rng.randint(50, 900), "en", rng.choice(user_uids), moment(), now)
+        for uid in book_uids
+    ):
+        await copy(
+            "books",
+            ["uid", "title", "author", "publisher", "published_date", "page_count",
+             "language", "user_uid", "created_at", "update_at"],
+            batch,
+        )
+
+    for batch in batches(
+        (book_uid, tag_uid)
+        for book_uid in book_uids
+        for tag_uid in rng.sample(tag_uids, rng.randint(0, 3))
+    ):
+        await copy("booktag", ["book_id", "tag_id"], batch)
+
+    # skewed, like real traffic: a fifth of the reviews go to 100 popular books
+    popular = book_uids[:100]
+    for batch in batches(
+        (uuid.uuid4(), rng.randint(1, 5), "...", rng.choice(user_uids),
+         rng.choice(popular) if rng.random() < 0.2 else rng.choice(book_uids),
+         moment(), now)
+        for _ in range(reviews)
+    ):
+        await copy(
+            "reviews",
+            ["uid", "rating", "review_text", "user_uid", "book_uid", "created_at", "update_at"],
+            batch,
+        )
+
+    async with async_engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql("ANALYZE")
+
+    print(f"seeded in {time.perf_counter() - started:.1f}s")
+
+
+async def pick_sample(session: AsyncSession) -> dict:
+    """Values for the queries: the most reviewed book and one of its reviewers"""
+
+    result = await session.execute(
+        select(Review.book_uid).group_by(Review.book_uid).order_by(func.count().desc()).limit(1)
+    )
+    book_uid = result.scalar_one()
+
+    result = await session.execute(
+        select(User.uid, User.email).join(Review, Review.user_uid == User.uid)
+        .where(Review.book_uid == book_uid).limit(1)
+    )
+    user_uid, email = result.one()
+
+    result = await session.execute(select(Tag.name).order_by(Tag.created_at.desc()).limit(2))
+
+    return {
+        "book_uid": book_uid,
+        "user_uid": user_uid,
+        "email": email,
+        "tags": list(result.scalars().all()),
+    }
+
+
+def service_calls(sample: dict) -> dict:
+    books, reviews, users, tags = BookService(), ReviewService(), UserService(), TagService()
+
+    return {
+        "UserService.get_user_by_email": lambda s: users.get_user_by_email(sample["email"], s),
+        "BookService.get_all_books": lambda s: books.get_all_books(s),
+        "BookService.get_all_books[rating]": lambda s: books.get_all_books(s, sort="rating"),
+        "BookService.get_user_books": lambda s: books.get_user_books(sample["user_uid"], s),
+        "BookService.get_book_detail": lambda s: books.get_book_detail(sample["book_uid"], s),
+        "BookService.filter_books_by_tags": lambda s: books.filter_books_by_tags(sample["tags"], "any", s),
+        "BookService.search_books": lambda s: books.search_books("silent ocean", s),
+        "ReviewService.get_book_reviews": lambda s: reviews.get_book_reviews(sample["book_uid"], s),
+        "ReviewService.get_user_reviews": lambda s: reviews.get_user_reviews(sample["user_uid"], s),
+        "TagService.get_tags": lambda s: tags.get_tags(s),
+    }
+
+
+def plan_nodes(node: dict) -> list:
+    """Flatten a JSON plan into 'Node Type on relation/index' strings"""
+
+    target = node.get("Index Name") or node.get("Relation Name")
+    nodes = [f"{node['Node Type']} on {target}" if target else node["Node Type"]]
+
+    for child in node.get("Plans", []):
+        nodes.extend(plan_nodes(child))
+
+    return nodes
+
+
+async def measure(calls: dict, drop_indexes: bool, repeat: int) -> dict:
+    results = {}
+
+    async with async_engine.connect() as conn:
+        await conn.begin()
+
+        for ddl in DROP_HOT_PATH_INDEXES if drop_indexes else []:
+            await conn.exec_driver_sql(ddl)
+
+        session = AsyncSession(bind=conn, expire_on_commit=False)
+
+        for name, call in calls.items():
+            statements = []
+
+            def capture(connection, cursor, statement, parameters, context, executemany):
+                statements.append((statement, parameters))
+
+            event.listen(conn.sync_connection, "before_cursor_execute", capture)
+            await call(session)
+            event.remove(conn.sync_connection, "before_cursor_execute", capture)
+
+            timings = []
+            for _ in range(repeat):
+                session.expunge_all()
+                started = time.perf_counter()
+                await call(session)
+                timings.append((time.perf_counter() - started) * 1000)
+            session.expunge_all()
+
+            plans = []
+            for statement, parameters in statements:
+                result = await conn.exec_driver_sql(
+                    "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement,
+                    tuple(parameters) if parameters else None,
+                )
+                plan = result.scalar()
+                plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]
+                plans.append({
+                    "statement": statement,
+                    "execution_ms": plan["Execution Time"],
+                    "nodes": plan_nodes(plan["Plan"]),
+                    "plan": plan,
+                })
+
+            results[name] = {"p50_ms": statistics.median(timings), "statements": plans}
+
+        await conn.rollback()
+
+    return results
+
+
+async def run(repeat: int, output: str) -> None:
+    async with AsyncSession(async_engine) as session:
+        sample = await pick_sample(session)
+
+    calls = service_calls(sample)
+    before = await measure(calls, drop_indexes=True, repeat=repeat)
+    after = await measure(calls, drop_indexes=False, repeat=repeat)
+
+    for name in calls:
+        print(
+            f"{name:<38} before p50 {before[name]['p50_ms']:9.2f} ms   "
+            f"after p50 {after[name]['p50_ms']:8.2f} ms"
+        )
+        for old, new in zip(before[name]["statements"], after[name]["statements"]):
+            print(f"    before: {', '.join(old['nodes'])}")
+            print(f"    after:  {', '.join(new['nodes'])}")
+
+    with open(output, "w") as file:
+        json.dump({"before": before, "after": after}, file, indent=2, default=str)
+
+    print(f"plans written to {output}")
+
+    await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--books", type=int, default=200000)
+    parser.add_argument("--reviews", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", default="query_plans.json")
+    parser.add_argument("--no-seed", action="store_true")
+    args = parser.parse_args()
+
+    # measure the database, not the response cache
+    Config.CACHE_ENABLED = False
+
+    async def go():
+        if not args.no_seed:
+            await seed(args.users, args.books, args.reviews)
+        await run(args.repeat, args.output)
+
+    asyncio.run(go())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""CPU cost of rendering list and detail responses, default versus FAST_RESPONSES.
+
+Serves synthetic payloads shaped like the real ones (a page of books, a book
+detail with its review preview and tags, the tag list, /auth/me with a
+user's books and reviews) from an in-process app whose routes are declared
+like the real routes, and measures the process CPU time per request with
+the fast path off and on. The payloads are what the services hand the
+routes: JSON-ready dicts from the cache, ORM objects for /auth/me.
+
+Each endpoint's response body must be identical in both modes; the
+benchmark stops if it is not.
+
+    python -m benchmarks.serialization --requests 2000 --page-size 100
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import List
+
+import httpx
+from fastapi import FastAPI, Response
+
+from src.auth.routes import user_books_adapter
+from src.auth.schemas import UserBooksModel
+from src.books.schemas import Book, BookDetailModel, BookPageModel
+from src.config import Config
+from src.db.models import Book as BookRow, Review as ReviewRow, User as UserRow
+from src.responses import fast_response
+from src.tags.schemas import TagModel
+
+NOW = datetime(2025, 3, 1, 12, 30, 15, 123456)
+
+
+def book_row(i: int) -> dict:
+    count = i % 40
+    return {
+        "uid": uuid.uuid4(),
+        "title": f"Der Schattenfluss — Band {i}",
+        "author": "Jahid Hasan",
+        "publisher": "Bookly Press",
+        "published_date": date(1990 + i % 30, 1 + i % 12, 1 + i % 28),
+        "page_count": 100 + i,
+        "language": "de",
+        "user_uid": uuid.uuid4(),
+        "created_at": NOW - timedelta(minutes=i),
+        "update_at": NOW,
+        "rating_count": count,
+        "rating_sum": count * 4 - i % 7 if count else 0,
+        "rating_1": 0, "rating_2": i % 3, "rating_3": 0, "rating_4": count - i % 3, "rating_5": 0,
+        "rating_score": (30 + count * 4 - i % 7) / (10 + count),
+    }
+
+
+def review_row(i: int, book_uid) -> dict:
+    return {
+        "uid": uuid.uuid4(),
+        "rating": 1 + i % 5,
+        "review_text": "Spannend bis zur letzten Seite. " * 4,
+        "user_uid": uuid.uuid4(),
+        "book_uid": book_uid,
+        "created_at": NOW - timedelta(hours=i),
+        "update_at": NOW,
+    }
+
+
+def tag(i: int) -> dict:
+    return {"uid": uuid.uuid4(), "name": f"genre-{i}", "created_at": NOW}
+
+
+def payloads(page_size: int) -> dict:
+    """The services' return values, built the way they build them"""
+
+    books = [BookRow(**book_row(i)) for i in range(page_size)]
+    page = BookPageModel.model_validate(
+        {"items": books, "next_cursor": "eyJzIjoiY3JlYXRlZF9hdCJ9"}, from_attributes=True
+    ).model_dump(mode="json")
+
+    book = books[0]
+    detail = BookDetailModel.model_validate(
+        {
+            **{name: getattr(book, name) for name in Book.model_fields},
+            "reviews": [review_row(i, book.uid) for i in range(Config.REVIEW_PREVIEW_SIZE)],
+            "reviews_next_cursor": None,
+            "tags": [tag(i) for i in range(8)],
+        },
+        from_attributes=True,
+    ).model_dump(mode="json")
+
+    tags = [TagModel.model_validate(tag(i)).model_dump(mode="json") for i in range(page_size * 5)]
+
+    user = UserRow(
+        uid=uuid.uuid4(), username="hasan202", email="hasanakash799@gmail.com",
+        first_name="jahid", last_name="hasan", role="user", is_verified=True,
+        password_hash="hash", created_at=NOW, updated_at=NOW,
+    )
+    user.books = [BookRow(**book_row(i)) for i in range(page_size)]
+    user.reviews = [ReviewRow(**review_row(i, book.uid)) for i in range(page_size)]
+
+    return {"books": page, "book detail": detail, "tags": tags, "me": user}
+
+
+def build_app(data: dict) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/books", response_model=BookPageModel)
+    async def books(response: Response):
+        return fast_response(data["books"], response)
+
+    @app.get("/book", response_model=BookDetailModel)
+    async def book(response: Response):
+        return fast_response(data["book detail"], response)
+
+    @app.get("/tags", response_model=List[TagModel])
+    async def tags(response: Response):
+        return fast_response(data["tags"], response)
+
+    @app.get("/me", response_model=UserBooksModel)
+    async def me(response: Response):
+        return fast_response(data["me"], response, adapter=user_books_adapter)
+
+    return app
+
+
+PATHS = {"books": "/books", "book detail": "/book", "tags": "/tags", "me": "/me"}
+
+
+async def measure(app: FastAPI, path: str, requests: int):
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+        body = (await client.get(path)).content
+
+        started = time.process_time()
+        for _ in range(requests):
+            (await client.get(path)).raise_for_status()
+
+        return (time.process_time() - started) / requests * 1000, body
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    app = build_app(payloads(args.page_size))
+
+    for name, path in PATHS.items():
+        results = {}
+        for fast in (False, True):
+            Config.FAST_RESPONSES = fast
+            results[fast] = asyncio.run(measure(app, path, args.requests))
+
+        (default_ms, default_body), (fast_ms, fast_body) = results[False], results[True]
+
+        if default_body != fast_body:
+            raise SystemExit(f"{name}: the fast path changed the response body")
+
+        print(
+            f"{name:<12} {len(fast_body):8d} bytes   default {default_ms:7.3f} ms   "
+            f"fast {fast_ms:7.3f} ms   {default_ms / fast_ms:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
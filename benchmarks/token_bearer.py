@@ -0,0 +1,71 @@
+"""Microbenchmarks for the access token dependency.
+
+Compares the old double decode in TokenBearer with a single decode and with
+a hit in the verified-token cache, then times the whole AccessTokenBearer
+call. The Redis blocklist lookup is replaced by a no-op so only the JWT work
+is measured. Needs the usual .env so that src.config can load.
+
+    python -m benchmarks.token_bearer --number 20000
+"""
+import argparse
+import asyncio
+import time
+import timeit
+
+from starlette.requests import Request
+
+from src.auth import dependencies, utils
+
+
+def make_request(token: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    })
+
+
+async def not_blocked(jti: str) -> bool:
+    return False
+
+
+def bench_bearer(token: str, number: int) -> float:
+    dependencies.token_in_blocklist = not_blocked
+    bearer = dependencies.AccessTokenBearer()
+    request = make_request(token)
+
+    async def run():
+        started = time.perf_counter()
+        for _ in range(number):
+            await bearer(request)
+        return time.perf_counter() - started
+
+    return asyncio.run(run())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = utils.create_access_token(
+        user_data={"email": "bench@example.com", "user_uid": "bench", "role": "user"}
+    )
+
+    cases = {
+        "decode twice (before)": lambda: (utils.decode_token(token), utils.decode_token(token)),
+        "decode once": lambda: utils.decode_token(token),
+        "verified-token cache hit": lambda: utils.decode_token_cached(token),
+    }
+
+    for name, func in cases.items():
+        elapsed = timeit.timeit(func, number=args.number)
+        print(f"{name:<28} {elapsed / args.number * 1e6:8.2f} us/call")
+
+    elapsed = bench_bearer(token, args.number)
+    print(f"{'AccessTokenBearer call':<28} {elapsed / args.number * 1e6:8.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
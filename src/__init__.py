@@ -3,7 +3,14 @@ from src.books.routes import book_router
 from src.auth.routes import auth_router
 from src.reviews.routes import review_router
 from src.tags.routes import tags_router
+from src.admin.routes import admin_router
 from src.db.main import init_db
+from src.auth.utils import shutdown_hash_executor
+from src.db.redis import blocklist_mirror
+from src.outbox import outbox_worker
+from src.metrics import mark_worker_dead, metrics_router
+from src.logs import start_logging, stop_logging
+from src.config import Config
 from .errors import register_all_errors
 from .middleware import register_middleware
 
@@ -40,8 +47,20 @@ app = FastAPI(
 
 @app.on_event("startup")
 async def on_startup():
+    start_logging()
     # Ensure the database is initialized and tables are created
     await init_db()
+    await blocklist_mirror.start()
+    if Config.OUTBOX_WORKER_ENABLED:
+        await outbox_worker.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await outbox_worker.stop()
+    await blocklist_mirror.stop()
+    shutdown_hash_executor()
+    mark_worker_dead()
+    stop_logging()
 
 register_all_errors(app)
 register_middleware(app)
@@ -50,3 +69,5 @@ app.include_router(book_router, prefix=f"{version_prefix}/books", tags=["books"]
 app.include_router(auth_router, prefix=f"{version_prefix}/auth", tags=["auth"])
 app.include_router(review_router, prefix=f"{version_prefix}/reviews", tags=["reviews"])
 app.include_router(tags_router, prefix=f"{version_prefix}/tags", tags=["tags"])
+app.include_router(admin_router, prefix=f"{version_prefix}/admin", tags=["admin"])
+app.include_router(metrics_router)
@@ -0,0 +1,33 @@
+import os
+
+from fastapi import APIRouter, Depends
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.auth.dependencies import RoleChecker
+from src.db.cache import cache_stats
+from src.db.main import get_pool_status, get_session
+from src.outbox import get_outbox_status
+
+admin_router = APIRouter()
+admin_role_checker = Depends(RoleChecker(["admin"]))
+
+
+@admin_router.get("/cache", dependencies=[admin_role_checker])
+async def get_cache_stats():
+    lookups = cache_stats["hits"] + cache_stats["misses"]
+
+    return {
+        **cache_stats,
+        "hit_ratio": cache_stats["hits"] / lookups if lookups else None,
+    }
+
+
+@admin_router.get("/pool", dependencies=[admin_role_checker])
+async def get_db_pool_status():
+    # per worker process; query every worker to see the whole deployment
+    return {"pid": os.getpid(), **get_pool_status()}
+
+
+@admin_router.get("/outbox", dependencies=[admin_role_checker])
+async def get_email_outbox_status(session: AsyncSession = Depends(get_session)):
+    return await get_outbox_status(session)
@@ -0,0 +1,125 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from redis.exceptions import RedisError
+
+from src.config import Config
+from src.db.redis import token_blocklist as redis_client
+from .schemas import UserPrincipalModel
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_PREFIX = "principal:"
+
+
+class LRUCache:
+    """Bounded in-process cache where every entry carries its own expiry"""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, tuple[Any, float]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, expires_at: float) -> None:
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+principal_cache = LRUCache(maxsize=Config.PRINCIPAL_CACHE_SIZE)
+
+
+def _principal_expiry(token_exp: float) -> float:
+    # never outlive the token, and bound how long other workers can serve a
+    # principal after it was evicted here
+    return min(token_exp, time.time() + Config.PRINCIPAL_CACHE_TTL)
+
+
+async def get_cached_principal(user_uid: str) -> Optional[UserPrincipalModel]:
+    """Look the principal up locally, then in Redis when that layer is enabled"""
+
+    principal = principal_cache.get(user_uid)
+
+    if principal is not None or not Config.PRINCIPAL_CACHE_REDIS:
+        return principal
+
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.get(PRINCIPAL_PREFIX + user_uid)
+            pipe.ttl(PRINCIPAL_PREFIX + user_uid)
+            cached, ttl = await pipe.execute()
+    except RedisError as e:
+        logger.warning("principal cache read failed: %s", e)
+        return None
+
+    if cached is None or ttl <= 0:
+        return None
+
+    principal = UserPrincipalModel.model_validate_json(cached)
+    principal_cache.set(user_uid, principal, _principal_expiry(time.time() + ttl))
+
+    return principal
+
+
+async def cache_principal(principal: UserPrincipalModel, token_exp: float) -> None:
+    expires_at = _principal_expiry(token_exp)
+    user_uid = str(principal.uid)
+
+    principal_cache.set(user_uid, principal, expires_at)
+
+    if not Config.PRINCIPAL_CACHE_REDIS:
+        return
+
+    # the same bound as the local copy: Redis holds no stale role for longer
+    ttl = int(expires_at - time.time())
+
+    if ttl <= 0:
+        return
+
+    try:
+        await redis_client.set(
+            PRINCIPAL_PREFIX + user_uid, principal.model_dump_json(), ex=ttl
+        )
+    except RedisError as e:
+        logger.warning("principal cache write failed: %s", e)
+
+
+async def evict_principal(user_uid) -> None:
+    user_uid = str(user_uid)
+
+    principal_cache.pop(user_uid)
+
+    if not Config.PRINCIPAL_CACHE_REDIS:
+        return
+
+    try:
+        await redis_client.delete(PRINCIPAL_PREFIX + user_uid)
+    except RedisError as e:
+        logger.warning("principal cache eviction failed: %s", e)
@@ -1,14 +1,15 @@
 from fastapi.security import HTTPBearer
 from fastapi import Request,status,Depends
 from fastapi.security.http import HTTPAuthorizationCredentials
-from .utils import decode_token
+from .utils import decode_token_cached
 from fastapi.exceptions import HTTPException
 from src.db.redis import token_in_blocklist
 from src.db.main import get_session
 from sqlmodel.ext.asyncio.session import AsyncSession
 from .service import UserService
+from .cache import cache_principal, get_cached_principal
+from .schemas import UserPrincipalModel
 from typing import List
-from src.db.models import User 
 from src.errors import (
     InvalidToken,
     RefreshTokenRequired,
@@ -31,9 +32,9 @@ class TokenBearer(HTTPBearer):
         creds = await super().__call__(request)
 
         token = creds.credentials
-        token_data = decode_token(token)
+        token_data = decode_token_cached(token)
 
-        if not self.token_valid(token):
+        if token_data is None:
             raise InvalidToken()
         
         if await token_in_blocklist(token_data['jti']):
@@ -43,11 +44,6 @@ class TokenBearer(HTTPBearer):
 
         return token_data
     
-    def token_valid(self, token:str) -> bool:
-        token_data = decode_token(token)
-
-        return token_data is not None
-    
     def verify_token_data(self, token_data):
         raise NotImplementedError("Please Override this method in child classes")
 
@@ -68,18 +64,31 @@ async def get_current_user(
     token_details: dict = Depends(AccessTokenBearer()),
     session: AsyncSession = Depends(get_session),
 ):
+    user_uid = token_details["user"]["user_uid"]
+
+    principal = await get_cached_principal(user_uid)
+
+    if principal is not None:
+        return principal
+
     user_email = token_details["user"]["email"]
 
     user = await user_service.get_user_by_email(user_email, session)
 
-    return user
+    if user is None:
+        return None
+
+    principal = UserPrincipalModel.model_validate(user, from_attributes=True)
+    await cache_principal(principal, token_details["exp"])
+
+    return principal
 
 class RoleChecker:
 
     def __init__(self, allowed_roles: List[str]) -> None:
         self.allowed_roles = allowed_roles
 
-    def __call__(self, current_user: User = Depends(get_current_user)):
+    def __call__(self, current_user: UserPrincipalModel = Depends(get_current_user)):
 
         if not current_user.is_verified:
             raise AccountNotVerified()
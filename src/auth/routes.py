@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends,status, BackgroundTasks
+from fastapi import APIRouter, Depends,status, BackgroundTasks, Response
+from pydantic import TypeAdapter
 from .schemas import UserCreateModel,UserModel,UserLoginModel,UserBooksModel,EmailModel,PasswordResetRequestModel,PasswordResetConfirmModel
 from .service import UserService
 from src.db.main import get_session
 from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi.exceptions import HTTPException
-from .utils import create_access_token,decode_token,verify_password, create_url_safe_token, decode_url_safe_token,generate_passwd_hash
+from .utils import create_access_token,decode_token,verify_password_async, create_url_safe_token, decode_url_safe_token,generate_passwd_hash_async
 from fastapi.responses import JSONResponse
 from datetime import timedelta,datetime
 from .dependencies import RefreshTokenBearer, AccessTokenBearer, get_current_user, RoleChecker
@@ -12,10 +13,13 @@ from src.db.redis import add_jti_to_blocklist
 from typing import List
 from src.db.models import User
 from src.errors import UserAlreadyExists, InvalidCredentials, InvalidToken,UserNotFound
-from src.mail import mail,create_message
+from src.outbox import enqueue_message, outbox_worker
 from src.config import Config
+from src.responses import fast_response
 
 
+user_books_adapter = TypeAdapter(UserBooksModel)
+
 REFRESH_TOKEN_EXPIRY = 2
 
 auth_router = APIRouter()
@@ -23,18 +27,19 @@ user_service = UserService()
 role_checker = RoleChecker(['admin','user'])
 
 @auth_router.post('/send_mail')
-async def send_mail(emails: EmailModel):
+async def send_mail(emails: EmailModel, session: AsyncSession = Depends(get_session)):
     emails = emails.addresses
 
     html ="<h1>Welcome to bookly application</h1>"
 
-    message = create_message(
+    await enqueue_message(
         recipients=emails,
         subject="This is a test message",
-        body=html
+        body=html,
+        session=session
     )
-
-    await mail.send_message(message)
+    await session.commit()
+    outbox_worker.wake.set()
 
     return { "message": "Email send successfully"}
 
@@ -58,13 +63,16 @@ async def create_user_Account(user_data: UserCreateModel, session: AsyncSession=
     <p> Please click this <a href="{link}">Link</a> to verify your accont</p>
     """
 
-    message = create_message(
+    await enqueue_message(
         recipients=[email],
         subject="Bookly Account Verification Mail",
-        body=html_message
+        body=html_message,
+        session=session
     )
 
-    await mail.send_message(message)
+    # the user and their verification email are committed together
+    await session.commit()
+    outbox_worker.wake.set()
 
     return {
         "message": "Account Created ! Check email to verify your accont",
@@ -98,10 +106,9 @@ async def login_users(login_data: UserLoginModel, session: AsyncSession = Depend
     password = login_data.password
 
     user = await user_service.get_user_by_email(email, session)
-    print("user==============>",user)
 
     if user is not None:
-        password_valid = verify_password(password, user.password_hash)
+        password_valid = await verify_password_async(password, user.password_hash)
 
         if password_valid:
             access_token = create_access_token(
@@ -141,15 +148,23 @@ async def get_new_access_token(token_details: dict = Depends(RefreshTokenBearer(
     expiry_timestamp = token_details['exp']
 
     if datetime.fromtimestamp(expiry_timestamp) > datetime.now():
-        new_access_token = create_access_token(user_data=token_details["user"])
+        new_access_token = create_access_token(user_data=dict(token_details["user"]))
 
         return JSONResponse(content={"access_token": new_access_token})
     
     raise InvalidToken()
 
 @auth_router.get('/me', response_model=UserBooksModel)
-async def get_current_user(user = Depends(get_current_user), _: bool = Depends(role_checker)):
-    return user
+async def get_current_user(
+    response: Response,
+    current_user = Depends(get_current_user),
+    _: bool = Depends(role_checker),
+    session: AsyncSession = Depends(get_session),
+):
+    # the principal only carries auth fields, /me needs the full user
+    user = await user_service.get_user_with_books(current_user.email, session)
+
+    return fast_response(user, response, adapter=user_books_adapter)
 
 
 
@@ -168,7 +183,7 @@ async def revoke_token(token_details: dict= Depends(AccessTokenBearer())):
     )
 
 @auth_router.post('/password-reset-request')
-async def password_reset_request(email_data: PasswordResetRequestModel):
+async def password_reset_request(email_data: PasswordResetRequestModel, session: AsyncSession = Depends(get_session)):
     email = email_data.email
 
     token = create_url_safe_token({"email": email})
@@ -179,11 +194,11 @@ async def password_reset_request(email_data: PasswordResetRequestModel):
     <p>Please click this <a href="{link}">Link</a> to reset your password</p>
     """
 
-    message = create_message(
-        recipients=[email], subject="Reset Your Password", body=html_message
+    await enqueue_message(
+        recipients=[email], subject="Reset Your Password", body=html_message, session=session
     )
-
-    await mail.send_message(message)
+    await session.commit()
+    outbox_worker.wake.set()
 
     return JSONResponse(
         content={
@@ -209,7 +224,7 @@ async def reset_account_password(token:str,passwords: PasswordResetConfirmModel
 
         if not user:
             raise UserNotFound()
-        password_hash = generate_passwd_hash(passwords.new_password)
+        password_hash = await generate_passwd_hash_async(passwords.new_password)
         await user_service.update_user(user, {"password_hash": password_hash }, session)
 
         return JSONResponse(
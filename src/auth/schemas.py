@@ -23,6 +23,13 @@ class UserModel(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+class UserPrincipalModel(BaseModel):
+    """The user fields that authorization needs, cheap enough to cache per token"""
+    uid: uuid.UUID
+    email: str
+    role: str
+    is_verified: bool
+
 class UserBooksModel(UserModel):
     books: List[Book]
     reviews: List[ReviewModel]
@@ -1,8 +1,15 @@
-from src.db.models import User
+from src.db.models import Book, User
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import raiseload, selectinload
+from src.errors import UserAlreadyExists
 from .schemas import UserCreateModel
-from .utils import generate_passwd_hash
+from .utils import generate_passwd_hash_async
+from .cache import evict_principal
+
+# changes to these fields must not be served from the principal cache
+PRINCIPAL_FIELDS = {"role", "is_verified", "password_hash"}
 
 
 class UserService:
@@ -11,6 +18,21 @@ class UserService:
         result = await session.execute(statement)  # Use session.execute, not session.exec
         user = result.scalars().one_or_none()  # Extract the mapped User instance or return None
         return user
+
+    async def get_user_with_books(self, email: str, session: AsyncSession):
+        """Get a user with the books and reviews that UserBooksModel renders"""
+        statement = (
+            select(User)
+            .where(User.email == email)
+            .options(
+                selectinload(User.books).options(
+                    raiseload(Book.reviews), raiseload(Book.tags)
+                ),
+                selectinload(User.reviews),
+            )
+        )
+        result = await session.execute(statement)
+        return result.scalars().one_or_none()
     
     async def user_exists(self, email, session: AsyncSession):
         user = await self.get_user_by_email(email, session)
@@ -18,15 +40,22 @@ class UserService:
         return True if user is not None else False
 
     async def create_user(self, user_data: UserCreateModel, session: AsyncSession):
+        """Add a user to the session; the caller commits, with the verification email"""
         user_data_dict = user_data.model_dump()
 
         new_user = User(**user_data_dict)
 
-        new_user.password_hash = generate_passwd_hash(user_data_dict['password'])
+        new_user.password_hash = await generate_passwd_hash_async(user_data_dict['password'])
         new_user.role="user"
 
         session.add(new_user)
-        await session.commit()
+
+        try:
+            await session.flush()
+        except IntegrityError:
+            # users.email is unique; a concurrent signup won the race
+            await session.rollback()
+            raise UserAlreadyExists()
 
         return new_user
     
@@ -35,6 +64,10 @@ class UserService:
             setattr(user,k,v)
         
         await session.commit()
+
+        if PRINCIPAL_FIELDS.intersection(user_data):
+            await evict_principal(user.uid)
+
         return user
 
 
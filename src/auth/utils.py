@@ -1,13 +1,34 @@
+import asyncio
+import hashlib
 import logging
+import time
 import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from types import MappingProxyType
+from typing import Mapping
 import jwt
 from passlib.context import CryptContext
 from itsdangerous import URLSafeTimedSerializer
 
 from src.config import Config
+from src.errors import ServerBusy
+from .cache import LRUCache
 
-passwd_context = CryptContext(schemes=["bcrypt"])
+logger = logging.getLogger(__name__)
+
+passwd_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=Config.BCRYPT_ROUNDS)
+
+# bcrypt releases the GIL, so threads are enough to keep it off the event loop
+if Config.PASSWORD_HASH_EXECUTOR == "process":
+    hash_executor = ProcessPoolExecutor(max_workers=Config.PASSWORD_HASH_WORKERS)
+else:
+    hash_executor = ThreadPoolExecutor(
+        max_workers=Config.PASSWORD_HASH_WORKERS, thread_name_prefix="passwd-hash"
+    )
+
+# hashes running or waiting for a worker
+pending_hashes = 0
 
 
 ACCESS_TOKEN_EXPIRY = 3600
@@ -23,6 +44,33 @@ def verify_password(password: str, hash: str) -> bool:
     return passwd_context.verify(password, hash)
 
 
+async def _run_in_hash_executor(func, *args):
+    global pending_hashes
+
+    # shed load instead of letting a login burst queue up behind bcrypt
+    if pending_hashes >= Config.PASSWORD_HASH_WORKERS + Config.PASSWORD_HASH_QUEUE_SIZE:
+        raise ServerBusy()
+
+    pending_hashes += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(hash_executor, func, *args)
+    finally:
+        pending_hashes -= 1
+
+
+async def generate_passwd_hash_async(password: str) -> str:
+    return await _run_in_hash_executor(generate_passwd_hash, password)
+
+
+async def verify_password_async(password: str, hash: str) -> bool:
+    return await _run_in_hash_executor(verify_password, password, hash)
+
+
+def shutdown_hash_executor() -> None:
+    hash_executor.shutdown(wait=False, cancel_futures=True)
+
+
 def create_access_token(
     user_data: dict, expiry: timedelta = None, refresh: bool = False
 ):
@@ -52,8 +100,45 @@ def decode_token(token: str) -> dict:
         return token_data
 
     except jwt.PyJWTError as e:
-        logging.exception(e)
+        logger.warning("invalid token: %s", e)
         return None
+
+
+verified_tokens = LRUCache(maxsize=Config.VERIFIED_TOKEN_CACHE_SIZE)
+
+
+def _freeze(claims: dict) -> Mapping:
+    return MappingProxyType({
+        name: _freeze(value) if isinstance(value, dict) else value
+        for name, value in claims.items()
+    })
+
+
+def decode_token_cached(token: str) -> Mapping:
+    """Decode a token, skipping signature verification for recently seen tokens.
+
+    Entries are keyed by a digest of the token so raw tokens are never kept
+    around, and never outlive the token's own `exp`. The claims are shared
+    between requests, so they come back read-only (`dict(...)` for a copy).
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+
+    token_data = verified_tokens.get(digest)
+
+    if token_data is not None:
+        return token_data
+
+    token_data = decode_token(token)
+
+    if token_data is not None:
+        token_data = _freeze(token_data)
+        verified_tokens.set(
+            digest,
+            token_data,
+            min(token_data["exp"], time.time() + Config.VERIFIED_TOKEN_CACHE_TTL),
+        )
+
+    return token_data
 serializer = URLSafeTimedSerializer(
     secret_key= Config.JWT_SECRET,
     salt="email-verification"
@@ -71,4 +156,4 @@ def decode_url_safe_token(token:str):
         token_data = serializer.loads(token)
         return token_data
     except Exception as e:
-        logging.error(str(e))
\ No newline at end of file
+        logger.error(str(e))
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""Streaming export of the catalogue as NDJSON or CSV.
+
+Books are read through a server-side cursor in uid order, so memory stays
+flat whatever the catalogue size and an interrupted export can be resumed
+by passing the uid of the last row received as `after`. The output uses the
+same fields (and `|`-separated tags in CSV) that the importer accepts.
+"""
+import csv
+import io
+import json
+import uuid
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.db.main import async_engine
+from src.db.models import Book, BookTag, Review, Tag
+
+EXPORT_BATCH_SIZE = 1000
+
+BOOK_FIELDS = [
+    "uid", "title", "author", "publisher", "published_date",
+    "page_count", "language", "user_uid", "created_at", "update_at",
+]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def export_statement(include_tags: bool, include_reviews: bool, after: Optional[uuid.UUID]):
+    columns = [getattr(Book, field) for field in BOOK_FIELDS]
+
+    if include_tags:
+        columns.append(
+            select(func.array_agg(Tag.name))
+            .join(BookTag, BookTag.tag_id == Tag.uid)
+            .where(BookTag.book_id == Book.uid)
+            .scalar_subquery()
+            .label("tags")
+        )
+
+    if include_reviews:
+        columns.append(
+            select(func.count(Review.uid))
+            .where(Review.book_uid == Book.uid)
+            .scalar_subquery()
+            .label("review_count")
+        )
+        columns.append(
+            select(func.avg(Review.rating))
+            .where(Review.book_uid == Book.uid)
+            .scalar_subquery()
+            .label("average_rating")
+        )
+
+    statement = select(*columns).order_by(Book.uid)
+
+    if after is not None:
+        statement = statement.where(Book.uid > after)
+
+    return statement
+
+
+def _jsonable(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if value is not None and not isinstance(value, (str, int, float, bool, list)):
+        return float(value)
+    return value
+
+
+def format_ndjson(rows, columns, write_header: bool) -> str:
+    return "".join(
+        json.dumps({
+            column: (value or []) if column == "tags" else _jsonable(value)
+            for column, value in zip(columns, row)
+        }) + "\n"
+        for row in rows
+    )
+
+
+def format_csv(rows, columns, write_header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+
+    if write_header:
+        writer.writerow(columns)
+
+    for row in rows:
+        writer.writerow([
+            "|".join(value or []) if column == "tags" else _jsonable(value)
+            for column, value in zip(columns, row)
+        ])
+
+    return buffer.getvalue()
+
+
+FORMATTERS = {"ndjson": format_ndjson, "csv": format_csv}
+
+
+async def stream_books(
+    format: str,
+    include_tags: bool = False,
+    include_reviews: bool = False,
+    after: Optional[uuid.UUID] = None,
+) -> AsyncIterator[str]:
+    """Yield the export one cursor batch at a time"""
+
+    formatter = FORMATTERS[format]
+    statement = export_statement(include_tags, include_reviews, after).execution_options(
+        yield_per=EXPORT_BATCH_SIZE
+    )
+
+    # the response outlives the request's session dependency, so own a session
+    async with AsyncSession(async_engine) as session:
+        result = await session.stream(statement)
+        columns = list(result.keys())
+        write_header = True
+
+        async for rows in result.partitions():
+            yield formatter(rows, columns, write_header)
+            write_header = False
+
+        if write_header and format == "csv":
+            yield formatter([], columns, write_header)
@@ -0,0 +1,297 @@
+"""Bulk import of books from NDJSON or CSV streams.
+
+Rows are validated in chunks against BookImportModel and loaded with
+asyncpg's COPY (or a batched multi-row INSERT on other drivers), with tag
+associations resolved in bulk per chunk. CSV input needs a header row, one
+record per line, and `|`-separated names in its optional `tags` column.
+
+    python -m src.books.importer books.ndjson --user-uid <uid>
+    python -m src.books.importer books.csv --user-uid <uid> --format csv
+"""
+import argparse
+import asyncio
+import csv
+import json
+import time
+import uuid
+from datetime import date, datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from asyncpg import InterfaceError, PostgresError
+from asyncpg.exceptions import DataError, IntegrityConstraintViolationError
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError as SQLDataError, IntegrityError, SQLAlchemyError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.db.cache import cache_uid, invalidate_tags
+from src.db.models import Book, BookTag
+from src.tags.service import TagService
+from .schemas import BookImportModel
+
+IMPORT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+BOOK_COLUMNS = [
+    "uid", "title", "author", "publisher", "published_date",
+    "page_count", "language", "user_uid", "created_at", "update_at",
+]
+BOOKTAG_COLUMNS = ["book_id", "tag_id"]
+CSV_TAG_SEPARATOR = "|"
+
+DATABASE_ERRORS = (SQLAlchemyError, PostgresError, InterfaceError)
+# errors caused by the values of some row; anything else fails the whole chunk
+# (asyncpg's client-side encoding errors are ValueErrors)
+ROW_ERRORS = (DataError, IntegrityConstraintViolationError, SQLDataError, IntegrityError, ValueError)
+
+tag_service = TagService()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a byte stream into lines without buffering the whole body"""
+
+    pending = b""
+
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+
+        for line in lines:
+            yield line
+
+    if pending:
+        yield pending
+
+
+async def iter_rows(
+    chunks: AsyncIterator[bytes], format: str
+) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Yield (row number, parsed row, parse error) for every non-blank row"""
+
+    header = None
+    row_number = 0
+
+    async for raw_line in iter_lines(chunks):
+        try:
+            line = raw_line.decode("utf-8").rstrip("\r")
+        except UnicodeDecodeError as e:
+            row_number += 1
+            yield row_number, None, str(e)
+            continue
+
+        if not line.strip():
+            continue
+
+        if format == "csv" and header is None:
+            header = next(csv.reader([line]))
+            continue
+
+        row_number += 1
+
+        try:
+            if format == "csv":
+                row = dict(zip(header, next(csv.reader([line]))))
+                tags = row.get("tags")
+                row["tags"] = [t for t in tags.split(CSV_TAG_SEPARATOR) if t] if tags else []
+            else:
+                row = json.loads(line)
+        except (ValueError, csv.Error) as e:
+            yield row_number, None, str(e)
+            continue
+
+        yield row_number, row, None
+
+
+class BookImporter:
+    def __init__(self, chunk_size: int = IMPORT_CHUNK_SIZE) -> None:
+        self.chunk_size = chunk_size
+
+    async def import_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        format: str,
+        user_uid: str,
+        session: AsyncSession,
+    ) -> dict:
+        inserted = 0
+        failed = 0
+        errors: List[dict] = []
+        chunk: List[Tuple[int, dict]] = []
+
+        def report(row_number: int, row_errors: List[dict]) -> None:
+            nonlocal failed
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": row_number, "errors": row_errors})
+
+        async def flush() -> None:
+            nonlocal inserted
+            inserted += await self._load_chunk(chunk, user_uid, session, report)
+            chunk.clear()
+
+        async for row_number, row, parse_error in iter_rows(chunks, format):
+            if parse_error is not None:
+                report(row_number, [{"msg": parse_error, "type": "parse_error"}])
+                continue
+
+            chunk.append((row_number, row))
+
+            if len(chunk) >= self.chunk_size:
+                await flush()
+
+        if chunk:
+            await flush()
+
+        if inserted:
+            await invalidate_tags("books", f"user-books:{cache_uid(user_uid)}")
+
+        return {"inserted": inserted, "failed": failed, "errors": errors}
+
+    async def _load_chunk(self, chunk, user_uid: str, session: AsyncSession, report) -> int:
+        now = datetime.now()
+        owner_uid = uuid.UUID(str(user_uid))
+        records = []
+        record_rows = []
+        book_tags: Dict[uuid.UUID, List[str]] = {}
+
+        for row_number, row in chunk:
+            try:
+                book = BookImportModel.model_validate(row)
+                published_date = date.fromisoformat(book.published_date)
+            except ValidationError as e:
+                report(
+                    row_number,
+                    e.errors(include_url=False, include_context=False, include_input=False),
+                )
+                continue
+            except ValueError as e:
+                report(row_number, [{"loc": ["published_date"], "msg": str(e), "type": "date_parsing"}])
+                continue
+
+            book_uid = uuid.uuid4()
+            records.append((
+                book_uid, book.title, book.author, book.publisher, published_date,
+                book.page_count, book.language, owner_uid, now, now,
+            ))
+            record_rows.append(row_number)
+            if book.tags:
+                book_tags[book_uid] = book.tags
+
+        if not records:
+            return 0
+
+        return await self._store_rows(list(zip(record_rows, records)), book_tags, session, report)
+
+    async def _store_rows(self, rows, book_tags, session: AsyncSession, report) -> int:
+        """Store (row number, record) pairs in one transaction.
+
+        When the database rejects a value the transaction is rolled back and
+        both halves are retried, so only the offending rows are reported and
+        the rest are still inserted.
+        """
+
+        records = [record for _, record in rows]
+
+        try:
+            await self._store_chunk(
+                records,
+                {record[0]: book_tags[record[0]] for record in records if record[0] in book_tags},
+                session,
+            )
+        except DATABASE_ERRORS as e:
+            await session.rollback()
+
+            if len(rows) > 1 and isinstance(e, ROW_ERRORS):
+                middle = len(rows) // 2
+                return (
+                    await self._store_rows(rows[:middle], book_tags, session, report)
+                    + await self._store_rows(rows[middle:], book_tags, session, report)
+                )
+
+            for row_number, _ in rows:
+                report(row_number, [{"msg": str(e), "type": "database_error"}])
+            return 0
+
+        return len(rows)
+
+    async def _store_chunk(self, records, book_tags, session: AsyncSession) -> None:
+        await self._copy(session, "books", BOOK_COLUMNS, records)
+
+        if book_tags:
+            tag_uids = await tag_service.upsert_tags(
+                {name for names in book_tags.values() for name in names}, session
+            )
+            await self._copy(
+                session,
+                "booktag",
+                BOOKTAG_COLUMNS,
+                list({
+                    (book_uid, tag_uids[name])
+                    for book_uid, names in book_tags.items()
+                    for name in names
+                }),
+            )
+
+        await session.commit()
+
+        if book_tags:
+            # after the commit, so no reader can cache the tag list in between
+            await invalidate_tags("tags")
+
+    async def _copy(self, session: AsyncSession, table: str, columns: List[str], records) -> None:
+        connection = await session.connection()
+
+        if connection.dialect.driver == "asyncpg":
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                table, records=records, columns=columns
+            )
+            return
+
+        # other drivers: executemany, which SQLAlchemy batches into multi-row INSERTs
+        model = {"books": Book, "booktag": BookTag}[table]
+        await session.execute(
+            insert(model), [dict(zip(columns, record)) for record in records]
+        )
+
+
+book_importer = BookImporter()
+
+
+async def read_file(path: str, size: int = 1 << 16) -> AsyncIterator[bytes]:
+    with open(path, "rb") as file:
+        while chunk := file.read(size):
+            yield chunk
+
+
+async def main(path: str, user_uid: str, format: str) -> None:
+    from src.db.main import async_engine
+
+    started = time.perf_counter()
+
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        report = await book_importer.import_stream(read_file(path), format, user_uid, session)
+
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "inserted": report["inserted"],
+        "failed": report["failed"],
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(report["inserted"] / elapsed) if elapsed else None,
+    }))
+
+    for error in report["errors"]:
+        print(json.dumps(error, default=str))
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--user-uid", required=True)
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.path, args.user_uid, args.format))
@@ -1,16 +1,34 @@
-from typing import List
+import uuid
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.exceptions import HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession
 from src.auth.dependencies import AccessTokenBearer
 
 from src.books.service import BookService
+from src.books.importer import book_importer
+from src.books.exporter import MEDIA_TYPES, stream_books
+from src.conditional import conditional_get
+from src.responses import fast_response
+from src.db.cache import cache_uid
 from src.db.main import get_session
+from src.db.replicas import get_read_session
 from src.auth.dependencies import RoleChecker
 
 
-from .schemas import Book, BookCreateModel, BookUpdateModel, BookDetailModel
+from .schemas import (
+    Book,
+    BookCreateModel,
+    BookUpdateModel,
+    BookDetailModel,
+    BookPageModel,
+    BookFilterPageModel,
+    BookImportResultModel,
+    BookSortKey,
+    SortOrder,
+)
 
 from src.errors import BookNotFound
 
@@ -18,27 +36,49 @@ book_router = APIRouter()
 book_service = BookService()
 access_token_bearer = AccessTokenBearer()
 role_checker = Depends(RoleChecker(['admin','user']))
+admin_role_checker = Depends(RoleChecker(['admin']))
 
 
-@book_router.get("/", response_model=List[Book], dependencies=[role_checker])
+@book_router.get("/", response_model=BookPageModel, dependencies=[role_checker])
 async def get_all_books(
-    session: AsyncSession = Depends(get_session),
+    request: Request,
+    response: Response,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    sort: BookSortKey = "created_at",
+    order: SortOrder = "desc",
+    session: AsyncSession = Depends(get_read_session),
     token_details: dict = Depends(access_token_bearer)
 ):
-    books = await book_service.get_all_books(session)
-    return books
+    books = await conditional_get(
+        request,
+        response,
+        tags=["books"],
+        loader=lambda: book_service.get_all_books(
+            session, limit=limit, cursor=cursor, sort=sort, order=order
+        ),
+        session=session,
+    )
+    return fast_response(books, response)
 
 
 @book_router.get(
-    "/user/{user_uid}", response_model=List[Book], dependencies=[role_checker]
+    "/user/{user_uid}", response_model=BookPageModel, dependencies=[role_checker]
 )
 async def get_user_book_submissions(
     user_uid: str,
-    session: AsyncSession = Depends(get_session),
+    response: Response,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    sort: BookSortKey = "created_at",
+    order: SortOrder = "desc",
+    session: AsyncSession = Depends(get_read_session),
     token_details: dict = Depends(access_token_bearer)
 ):
-    books = await book_service.get_user_books(user_uid, session)
-    return books
+    books = await book_service.get_user_books(
+        user_uid, session, limit=limit, cursor=cursor, sort=sort, order=order
+    )
+    return fast_response(books, response)
 
 
 @book_router.post(
@@ -57,18 +97,92 @@ async def create_a_book(
     return new_book
 
 
+@book_router.post(
+    "/import",
+    response_model=BookImportResultModel,
+    dependencies=[admin_role_checker]
+)
+async def import_books(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    session: AsyncSession = Depends(get_session),
+    token_details: dict = Depends(access_token_bearer)
+):
+    """Stream NDJSON or CSV rows into the catalogue and report the rows that failed"""
+    user_id = token_details.get('user')['user_uid']
+    report = await book_importer.import_stream(request.stream(), format, user_id, session)
+    return report
+
+
+@book_router.get("/filter", response_model=BookFilterPageModel, dependencies=[role_checker])
+async def filter_books_by_tags(
+    response: Response,
+    tags: List[str] = Query(min_length=1, max_length=20),
+    match: Literal["all", "any"] = "all",
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    sort: BookSortKey = "created_at",
+    order: SortOrder = "desc",
+    session: AsyncSession = Depends(get_read_session),
+    token_details: dict = Depends(access_token_bearer)
+):
+    """Books tagged with all (or any) of `tags`, with tag counts over the whole result"""
+    books = await book_service.filter_books_by_tags(
+        tags, match, session, limit=limit, cursor=cursor, sort=sort, order=order
+    )
+    return fast_response(books, response)
+
+
+@book_router.get("/search", response_model=BookPageModel, dependencies=[role_checker])
+async def search_books(
+    response: Response,
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session),
+    token_details: dict = Depends(access_token_bearer)
+):
+    """Books matching `q` in title, author or publisher, ranked by relevance"""
+    books = await book_service.search_books(q, session, limit=limit, cursor=cursor)
+    return fast_response(books, response)
+
+
+@book_router.get("/export", dependencies=[role_checker])
+async def export_books(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    include_tags: bool = False,
+    include_reviews: bool = False,
+    after: Optional[uuid.UUID] = None,
+    token_details: dict = Depends(access_token_bearer)
+):
+    """Stream the whole catalogue; pass the last uid received as `after` to resume"""
+    return StreamingResponse(
+        stream_books(format, include_tags, include_reviews, after),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="books.{format}"'},
+    )
+
+
 @book_router.get(
     "/{book_uid}",response_model=BookDetailModel, dependencies=[role_checker]
 )
 async def get_book(
-    book_uid: str,
-    session: AsyncSession = Depends(get_session),
+    book_uid: uuid.UUID,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
     token_details: dict = Depends(access_token_bearer)
 ) -> dict:
-    book = await book_service.get_book(book_uid, session)
+    book = await conditional_get(
+        request,
+        response,
+        tags=[f"book:{cache_uid(book_uid)}"],
+        loader=lambda: book_service.get_book_detail(book_uid, session),
+        session=session,
+    )
 
     if book:
-        return book
+        return fast_response(book, response)
     else:
         raise BookNotFound()
 
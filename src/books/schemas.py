@@ -1,9 +1,9 @@
 import uuid
 from datetime import date, datetime
-from typing import List
+from typing import List, Literal, Optional
 from src.reviews.schemas import ReviewModel
 from src.tags.schemas import TagModel
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 
 
 class Book(BaseModel):
@@ -16,9 +16,32 @@ class Book(BaseModel):
     language: str
     created_at: datetime
     update_at: datetime
+    rating_count: int = 0
+    rating_average: Optional[float] = None
+    rating_score: Optional[float] = None
+    # number of 1..5 star reviews
+    rating_histogram: List[int] = Field(default_factory=lambda: [0] * 5)
+
+BookSortKey = Literal["created_at", "title", "published_date", "page_count", "rating"]
+SortOrder = Literal["asc", "desc"]
+
+
+class BookPageModel(BaseModel):
+    items: List[Book]
+    next_cursor: Optional[str] = None
+
+class TagFacetModel(BaseModel):
+    name: str
+    count: int
+
+
+class BookFilterPageModel(BookPageModel):
+    facets: List[TagFacetModel]
 
 class BookDetailModel(Book):
+    # newest REVIEW_PREVIEW_SIZE reviews; the cursor continues at /reviews/book/{uid}
     reviews: List[ReviewModel]
+    reviews_next_cursor: Optional[str] = None
     tags: List[TagModel]
 
 class BookCreateModel(BaseModel):
@@ -30,6 +53,37 @@ class BookCreateModel(BaseModel):
     language: str
 
 
+# books.page_count is a Postgres integer
+INT4_MIN, INT4_MAX = -2**31, 2**31 - 1
+
+
+class BookImportModel(BookCreateModel):
+    """An imported row, checked against what the books table accepts too,
+    so a bad value is reported as that row's error rather than failing its
+    chunk at COPY time"""
+    page_count: int = Field(ge=INT4_MIN, le=INT4_MAX)
+    tags: List[str] = []
+
+    @field_validator("title", "author", "publisher", "language", "tags")
+    @classmethod
+    def no_nul_characters(cls, value):
+        # text columns cannot store NUL
+        if any("\x00" in text for text in ([value] if isinstance(value, str) else value)):
+            raise ValueError("must not contain NUL characters")
+        return value
+
+
+class BookImportErrorModel(BaseModel):
+    row: int
+    errors: List[dict]
+
+
+class BookImportResultModel(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BookImportErrorModel]
+
+
 class BookUpdateModel(BaseModel):
     title: str
     author: str
@@ -1,32 +1,245 @@
-from datetime import datetime
-from sqlmodel import desc, select
+import json
+from datetime import date, datetime
+from typing import List, Optional
+from sqlalchemy import distinct, func, update
+from sqlmodel import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import noload, raiseload
 
-from src.db.models import Book
-from .schemas import BookCreateModel, BookUpdateModel
+from src.config import Config
+from src.db.cache import cache_uid, invalidate_tags, read_through
+from src.db.models import BOOK_SEARCH_VECTOR, Book, BookTag, Review, Tag
+from src.pagination import encode_cursor, keyset_page, next_cursor
+from .schemas import BookCreateModel, BookDetailModel, BookPageModel, BookUpdateModel
+
+# sort key -> (column, python type of the cursor value)
+# every key is backed by a (column, uid) index on books
+BOOK_SORT_KEYS = {
+    "created_at": (Book.created_at, datetime),
+    "title": (Book.title, str),
+    "published_date": (Book.published_date, date),
+    "page_count": (Book.page_count, int),
+    "rating": (Book.rating_score, float),
+}
 
 
 class BookService:
-    async def get_all_books(self, session: AsyncSession):
-        statement = select(Book).order_by(desc(Book.created_at))
+    async def _get_books_page(
+        self,
+        statement,
+        session: AsyncSession,
+        limit: int,
+        cursor: Optional[str],
+        sort: str,
+        order: str,
+    ):
+        sort_column, value_type = BOOK_SORT_KEYS[sort]
+
+        # list responses only use the Book columns, so never pull reviews/tags
+        statement = keyset_page(
+            statement.options(raiseload(Book.reviews), raiseload(Book.tags)),
+            sort_column,
+            Book.uid,
+            sort=sort,
+            order=order,
+            limit=limit,
+            cursor=cursor,
+            value_type=value_type,
+        )
+
         result = await session.execute(statement)
-        return result.scalars().all()
+        books, cursor = next_cursor(
+            list(result.scalars().all()), limit, sort, order, attribute=sort_column.key
+        )
+
+        page = BookPageModel.model_validate(
+            {"items": books, "next_cursor": cursor}, from_attributes=True
+        )
+
+        return page.model_dump(mode="json")
+
+    async def get_all_books(
+        self,
+        session: AsyncSession,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        sort: str = "created_at",
+        order: str = "desc",
+    ):
+        statement = select(Book)
+
+        return await read_through(
+            key=f"books:{sort}:{order}:{limit}:{cursor or ''}",
+            tags=["books"],
+            session=session,
+            loader=lambda: self._get_books_page(
+                statement, session, limit, cursor, sort, order
+            ),
+        )
+
+    async def get_user_books(
+        self,
+        user_uid: str,
+        session: AsyncSession,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        sort: str = "created_at",
+        order: str = "desc",
+    ):
+        statement = select(Book).where(Book.user_uid == user_uid)
+
+        return await read_through(
+            key=f"user-books:{cache_uid(user_uid)}:{sort}:{order}:{limit}:{cursor or ''}",
+            tags=[f"user-books:{cache_uid(user_uid)}"],
+            session=session,
+            loader=lambda: self._get_books_page(
+                statement, session, limit, cursor, sort, order
+            ),
+        )
+
+    async def filter_books_by_tags(
+        self,
+        tag_names: List[str],
+        match: str,
+        session: AsyncSession,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        sort: str = "created_at",
+        order: str = "desc",
+    ):
+        """Books carrying all (or any) of the tags, plus per-tag counts over the result"""
+
+        tag_names = sorted(set(tag_names))
+
+        matching_books = (
+            select(BookTag.book_id)
+            .join(Tag, Tag.uid == BookTag.tag_id)
+            .where(Tag.name.in_(tag_names))
+            .group_by(BookTag.book_id)
+        )
+        if match == "all":
+            matching_books = matching_books.having(
+                func.count(distinct(Tag.name)) == len(tag_names)
+            )
+
+        async def load_filtered_books():
+            page = await self._get_books_page(
+                select(Book).where(Book.uid.in_(matching_books)),
+                session, limit, cursor, sort, order,
+            )
 
-    async def get_user_books(self, user_uid: str, session: AsyncSession):
-        statement = (
-            select(Book)
-            .where(Book.user_uid == user_uid)
-            .order_by(desc(Book.created_at))
+            book_count = func.count(BookTag.book_id)
+            facets = await session.execute(
+                select(Tag.name, book_count)
+                .join(BookTag, BookTag.tag_id == Tag.uid)
+                .where(BookTag.book_id.in_(matching_books))
+                .group_by(Tag.name)
+                .order_by(book_count.desc(), Tag.name)
+            )
+            page["facets"] = [{"name": name, "count": count} for name, count in facets.all()]
+
+            return page
+
+        return await read_through(
+            key=f"books:filter:{match}:{json.dumps(tag_names)}:{sort}:{order}:{limit}:{cursor or ''}",
+            tags=["books", "tags"],
+            session=session,
+            loader=load_filtered_books,
+        )
+
+    async def search_books(
+        self,
+        query: str,
+        session: AsyncSession,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ):
+        """Full-text search over title, author and publisher, best match first"""
+
+        ts_query = func.websearch_to_tsquery("english", query)
+        rank = func.ts_rank(BOOK_SEARCH_VECTOR, ts_query)
+
+        statement = keyset_page(
+            select(Book, rank.label("rank"))
+            .where(BOOK_SEARCH_VECTOR.bool_op("@@")(ts_query))
+            .options(raiseload(Book.reviews), raiseload(Book.tags)),
+            rank,
+            Book.uid,
+            sort="rank",
+            order="desc",
+            limit=limit,
+            cursor=cursor,
+            value_type=float,
         )
 
         result = await session.execute(statement)
-        return result.scalars().all()
+        rows = result.all()
+        cursor = None
+
+        if len(rows) > limit:
+            rows = rows[:limit]
+            cursor = encode_cursor("rank", "desc", rows[-1].rank, rows[-1].Book.uid)
+
+        page = BookPageModel.model_validate(
+            {"items": [row.Book for row in rows], "next_cursor": cursor}, from_attributes=True
+        )
+
+        return page.model_dump(mode="json")
 
     async def get_book(self, book_uid: str, session: AsyncSession):
-        statement = select(Book).where(Book.uid == book_uid)
+        # callers change the book or attach to it; none reads all its reviews
+        statement = select(Book).options(noload(Book.reviews)).where(Book.uid == book_uid)
         result = await session.execute(statement)
         return result.scalars().first()
 
+    async def get_book_detail(self, book_uid: str, session: AsyncSession):
+        """Get a book with its tags and newest reviews, serialized for the response"""
+
+        async def load_book_detail():
+            statement = (
+                select(Book).options(raiseload(Book.reviews)).where(Book.uid == book_uid)
+            )
+            result = await session.execute(statement)
+            book = result.scalars().first()
+
+            if book is None:
+                return None
+
+            # a capped preview; GET /reviews/book/{uid} pages through the rest
+            preview_size = Config.REVIEW_PREVIEW_SIZE
+            statement = keyset_page(
+                select(Review).where(Review.book_uid == book.uid),
+                Review.created_at,
+                Review.uid,
+                sort="created_at",
+                order="desc",
+                limit=preview_size,
+                cursor=None,
+                value_type=datetime,
+            )
+            result = await session.execute(statement)
+            reviews, reviews_cursor = next_cursor(
+                list(result.scalars().all()), preview_size, "created_at", "desc",
+                attribute="created_at",
+            )
+
+            detail = {
+                name: getattr(book, name)
+                for name in BookDetailModel.model_fields
+                if name not in ("reviews", "reviews_next_cursor")
+            }
+
+            return BookDetailModel.model_validate(
+                {**detail, "reviews": reviews, "reviews_next_cursor": reviews_cursor},
+                from_attributes=True,
+            ).model_dump(mode="json")
+
+        book_key = f"book:{cache_uid(book_uid)}"
+
+        return await read_through(
+            key=book_key, tags=[book_key], session=session, loader=load_book_detail
+        )
+
     async def create_book(
         self, book_data: BookCreateModel, user_uid: str,session: AsyncSession
     ):
@@ -40,6 +253,8 @@ class BookService:
         session.add(new_book)
         await session.commit()
 
+        await invalidate_tags("books", f"user-books:{cache_uid(user_uid)}")
+
         return new_book
 
     async def update_book(
@@ -54,6 +269,12 @@ class BookService:
                 setattr(book_to_update, k, v)
 
             await session.commit()
+
+            await invalidate_tags(
+                "books",
+                f"book:{book_to_update.uid}",
+                f"user-books:{book_to_update.user_uid}",
+            )
             return book_to_update
         else:
             return None
@@ -62,8 +283,21 @@ class BookService:
         book_to_delete = await self.get_book(book_uid, session)
 
         if book_to_delete:
+            deleted_tags = (
+                "books",
+                f"book:{book_to_delete.uid}",
+                f"user-books:{book_to_delete.user_uid}",
+            )
+            # the reviews are not loaded, so detach them here, as the ORM would
+            await session.execute(
+                update(Review)
+                .where(Review.book_uid == book_to_delete.uid)
+                .values(book_uid=None)
+            )
             await session.delete(book_to_delete)
             await session.commit()
+
+            await invalidate_tags(*deleted_tags)
             return {}
         else:
             return None
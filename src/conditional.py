@@ -0,0 +1,129 @@
+"""Conditional GET: ETag / Last-Modified validators and 304 responses.
+
+Validators come from the versions of the cache tags a response depends on
+(see `tag_versions`), so checking If-None-Match or If-Modified-Since takes
+one Redis round trip and neither the database nor the serializer. Without a
+working cache, or when the body is read from a replica that may not have
+the latest write yet, they fall back to a hash of the body, which still
+saves the transfer.
+"""
+import hashlib
+import json
+import math
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Iterable, NamedTuple, Optional
+
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+
+from src.db.cache import from_replica, tag_versions
+
+# responses need a token: only the client may store them, and must revalidate
+CACHE_CONTROL = "private, no-cache"
+
+
+class Validators(NamedTuple):
+    etag: str
+    last_modified: Optional[float] = None
+
+
+def _etag(*parts: str) -> str:
+    return '"' + hashlib.sha256("|".join(parts).encode()).hexdigest()[:32] + '"'
+
+
+async def version_validators(request: Request, tags: Iterable[str]) -> Optional[Validators]:
+    versions = await tag_versions(*tags)
+
+    if versions is None:
+        return None
+
+    # the query string picks the page, sort and limit
+    return Validators(
+        etag=_etag(request.url.path, request.url.query, *map(str, versions)),
+        last_modified=max(versions) / 1e9,
+    )
+
+
+def body_validators(body: Any) -> Validators:
+    return Validators(etag=_etag(json.dumps(jsonable_encoder(body), sort_keys=True)))
+
+
+def not_modified(request: Request, validators: Validators, found: bool = True) -> bool:
+    """Whether the client's copy is current; `*` only matches a `found` resource"""
+
+    if_none_match = request.headers.get("If-None-Match")
+
+    # If-None-Match wins when both are sent; GET compares ETags weakly
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return ("*" in tags and found) or validators.etag in tags
+
+    if_modified_since = request.headers.get("If-Modified-Since")
+
+    if if_modified_since is None or validators.last_modified is None:
+        return False
+
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+    # exact: a later write is never older than a second the client holds
+    return validators.last_modified < since
+
+
+def validator_headers(validators: Validators) -> dict:
+    headers = {"ETag": validators.etag, "Cache-Control": CACHE_CONTROL}
+
+    if validators.last_modified is not None:
+        # HTTP dates have whole seconds: round up, so the header is at or after
+        # the version, and only once that second is over, so no later write
+        # can fall inside it
+        last_modified = math.ceil(validators.last_modified)
+
+        if last_modified <= time.time():
+            headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+
+    return headers
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    tags: Iterable[str],
+    loader: Callable[[], Awaitable[Any]],
+    session: Optional[Any] = None,
+) -> Any:
+    """The loader's result with validator headers set, or an empty 304.
+
+    Versions are read before loading, so a write racing the load can only
+    make the ETag older than the body, never newer. That holds across
+    requests too: `read_through` serves a cached body only while the
+    versions it was loaded under are current, so a fill that raced a write
+    is never certified by the version that write created. It does not hold
+    for a replica `session`, which can return rows older than the version,
+    so those responses get a hash of the body instead. None from the loader
+    (not found) is passed through.
+    """
+
+    validators = None if from_replica(session) else await version_validators(request, tags)
+
+    # the resource may not exist yet: no `*` until the loader found it
+    if validators is not None and not_modified(request, validators, found=False):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(validators))
+
+    body = await loader()
+
+    if body is None:
+        return None
+
+    if validators is None:
+        validators = body_validators(body)
+
+    if not_modified(request, validators):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(validators))
+
+    response.headers.update(validator_headers(validators))
+
+    return body
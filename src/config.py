@@ -1,3 +1,5 @@
+from typing import List
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -6,9 +8,42 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     JWT_SECRET: str
     JWT_ALGORITHM: str
+    # per worker process: size for (uvicorn workers x pool) <= max_connections
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800  # seconds, -1 to never recycle
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100  # asyncpg prepared statements per connection
+    DB_ECHO: bool = False
+    # read replicas for GET routes, e.g. '["postgresql+asyncpg://...:5433/bookly"]'
+    DATABASE_REPLICA_URLS: List[str] = []
+    REPLICA_RETRY_AFTER: float = 30
+    READ_YOUR_WRITES_SECONDS: int = 5
     REDIS_HOST: str ="localhost"
     REDIS_PORT: int =6379
 
+    CACHE_ENABLED: bool = True
+    CACHE_TTL: int = 300
+
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL: int = 60
+    PRINCIPAL_CACHE_REDIS: bool = False
+
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # "thread" or "process"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_SIZE: int = 32
+
+    VERIFIED_TOKEN_CACHE_SIZE: int = 10000
+    VERIFIED_TOKEN_CACHE_TTL: int = 300
+
+    # Bayesian average: every book starts with this many votes at
+    # RATING_PRIOR_MEAN (src.db.models); rescore after changing it
+    RATING_PRIOR_WEIGHT: int = 10
+    # newest reviews embedded in a book's detail; the rest are paged
+    REVIEW_PREVIEW_SIZE: int = 5
+
     MAIL_USERNAME: str
     MAIL_PASSWORD: str
     MAIL_FROM: str
@@ -20,8 +55,30 @@ class Settings(BaseSettings):
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
 
+    OUTBOX_WORKER_ENABLED: bool = True
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_POLL_INTERVAL: float = 5
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_BACKOFF_BASE: int = 30
+    OUTBOX_BACKOFF_MAX: int = 3600
+    # a batch's rows stay claimed this long; a worker that dies mid-batch
+    # leaves them to be sent again afterwards
+    OUTBOX_CLAIM_TIMEOUT: int = 300
+
     DOMAIN: str
 
+    LOG_LEVEL: str = "INFO"
+    ACCESS_LOG_ENABLED: bool = True
+    # share of successful requests logged; errors and slow requests always are
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0
+    ACCESS_LOG_SLOW_MS: float = 1000
+
+    # encode cached list/detail payloads straight to bytes (see src/responses.py)
+    FAST_RESPONSES: bool = False
+
+    # adds X-Query-Count / X-Query-Time response headers
+    DEBUG: bool = False
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
@@ -0,0 +1,216 @@
+import json
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+from redis.exceptions import RedisError
+
+from src.config import Config
+from src.db.redis import token_blocklist as redis_client
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "cache:"
+TAG_PREFIX = "cache:tag:"
+# tag -> time_ns of its last invalidation, which HTTP validators derive from
+VERSION_PREFIX = "cache:ver:"
+# an expired version restarts at the current time, which only costs clients a
+# full response; it keeps lookups of unknown uids from piling up keys
+VERSION_TTL = 86400
+
+cache_stats = {"hits": 0, "misses": 0, "errors": 0, "invalidations": 0}
+
+# tags whose invalidation did not reach Redis, retried on the next cache access
+_failed_invalidations: set = set()
+# at most once per interval, so an outage does not add a retry to every read
+INVALIDATION_RETRY_INTERVAL = 1.0
+_last_invalidation_retry = 0.0
+
+
+def from_replica(session) -> bool:
+    return session is not None and "replica" in session.info
+
+
+def cache_uid(uid) -> str:
+    """Normalise a uid so every spelling of it maps to the same cache key"""
+
+    try:
+        return str(uuid.UUID(str(uid)))
+    except ValueError:
+        return str(uid)
+
+
+async def read_through(
+    key: str,
+    tags: Iterable[str],
+    loader: Callable[[], Awaitable[Any]],
+    ttl: Optional[int] = None,
+    session: Optional[Any] = None,
+) -> Any:
+    """Return the cached value for `key`, loading and storing it on a miss.
+
+    `loader` must return JSON-serializable data (or None, which is never
+    cached). The entry is registered under each dependency tag so that
+    `invalidate_tags` can drop it when the underlying rows change. Redis
+    failures fall back to the loader so the cache never takes the API down.
+
+    Entries carry the tag versions read before their value was loaded and
+    are only served while those are still current: a fill that loaded rows
+    before a concurrent write, but stored them after its invalidation, is
+    never served, so no version vouches for data older than itself.
+
+    Values loaded through a read-replica `session` are returned but not
+    stored: the replica may not have a write yet, and a stale entry would be
+    served, to the writer too, for the whole TTL.
+    """
+
+    if not Config.CACHE_ENABLED:
+        return await loader()
+
+    tags = list(tags)
+
+    if _failed_invalidations:
+        await _retry_invalidations()
+
+        # this worker knows these entries may be stale; skip them until then
+        if _failed_invalidations.intersection(tags):
+            return await loader()
+
+    cache_key = CACHE_PREFIX + key
+
+    try:
+        cached, *versions = await redis_client.mget(
+            [cache_key, *(VERSION_PREFIX + tag for tag in tags)]
+        )
+    except RedisError as e:
+        cache_stats["errors"] += 1
+        logger.warning("cache read failed for %s: %s", key, e)
+        return await loader()
+
+    if cached is not None:
+        entry = json.loads(cached)
+
+        if entry["versions"] == versions:
+            cache_stats["hits"] += 1
+            return entry["value"]
+
+    cache_stats["misses"] += 1
+
+    if from_replica(session):
+        return await loader()
+
+    if None in versions:
+        versions = await tag_versions(*tags)
+
+        if versions is None:
+            return await loader()
+
+        versions = [str(version) for version in versions]
+
+    value = await loader()
+
+    if value is None:
+        return value
+
+    ttl = ttl or Config.CACHE_TTL
+
+    try:
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.set(cache_key, json.dumps({"versions": versions, "value": value}), ex=ttl)
+            for tag in tags:
+                pipe.sadd(TAG_PREFIX + tag, cache_key)
+                pipe.expire(TAG_PREFIX + tag, ttl)
+            await pipe.execute()
+    except RedisError as e:
+        cache_stats["errors"] += 1
+        logger.warning("cache write failed for %s: %s", key, e)
+
+    return value
+
+
+async def invalidate_tags(*tags: str) -> None:
+    """Drop every cache entry registered under any of the given tags.
+
+    When Redis cannot be reached the tags are remembered and invalidated
+    again before this worker's next cache access; until that succeeds the
+    worker neither serves nor validates anything under them.
+    """
+
+    if not Config.CACHE_ENABLED or not tags:
+        return
+
+    tags = sorted({*tags, *_failed_invalidations})
+    tag_keys = [TAG_PREFIX + tag for tag in tags]
+
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            members = await pipe.execute()
+
+        keys = set(tag_keys)
+        for tag_members in members:
+            keys.update(tag_members)
+
+        now = time.time_ns()
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(*keys)
+            for tag in tags:
+                pipe.set(VERSION_PREFIX + tag, now, ex=VERSION_TTL)
+            await pipe.execute()
+
+        cache_stats["invalidations"] += 1
+        _failed_invalidations.difference_update(tags)
+    except RedisError as e:
+        cache_stats["errors"] += 1
+        _failed_invalidations.update(tags)
+        logger.warning("cache invalidation failed for %s: %s", tags, e)
+
+
+async def _retry_invalidations() -> None:
+    global _last_invalidation_retry
+
+    if time.monotonic() - _last_invalidation_retry < INVALIDATION_RETRY_INTERVAL:
+        return
+
+    _last_invalidation_retry = time.monotonic()
+    await invalidate_tags(*_failed_invalidations)
+
+
+async def tag_versions(*tags: str) -> Optional[List[int]]:
+    """When each tag was last invalidated, in ns; None without a working cache.
+
+    A version that is missing (first use, expired, or Redis lost its data)
+    starts now, so that no validator handed out before can match it again.
+    """
+
+    if not Config.CACHE_ENABLED:
+        return None
+
+    if _failed_invalidations:
+        await _retry_invalidations()
+
+        if _failed_invalidations.intersection(tags):
+            return None
+
+    version_keys = [VERSION_PREFIX + tag for tag in tags]
+
+    try:
+        versions = await redis_client.mget(version_keys)
+
+        if None in versions:
+            now = time.time_ns()
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for version_key, version in zip(version_keys, versions):
+                    if version is None:
+                        pipe.set(version_key, now, nx=True, ex=VERSION_TTL)
+                await pipe.execute()
+
+            versions = await redis_client.mget(version_keys)
+    except RedisError as e:
+        cache_stats["errors"] += 1
+        logger.warning("reading cache versions failed for %s: %s", tags, e)
+        return None
+
+    return [int(version) for version in versions]
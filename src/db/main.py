@@ -1,13 +1,173 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 from src.config import Config
+from src.metrics import (
+    DB_POOL_CHECKED_OUT,
+    DB_POOL_OVERFLOW,
+    DB_POOL_TIMEOUTS,
+    DB_POOL_WAIT,
+    DB_QUERY_DURATION,
+)
+
+pool_stats = {
+    "checkouts": 0,
+    "timeouts": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+    "overflow_peak": 0,
+}
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait and how far it overflows.
+
+    The wait includes opening a new connection when the pool is below its
+    size, as well as queueing for a connection when it is at its limit.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+
+        try:
+            connection = super()._do_get()
+        except PoolTimeout:
+            pool_stats["timeouts"] += 1
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            pool_stats["wait_seconds_total"] += waited
+            pool_stats["wait_seconds_max"] = max(pool_stats["wait_seconds_max"], waited)
+            DB_POOL_WAIT.observe(waited)
+
+        overflow = self.overflow()
+        pool_stats["checkouts"] += 1
+        pool_stats["overflow_peak"] = max(pool_stats["overflow_peak"], overflow)
+        DB_POOL_CHECKED_OUT.inc()
+        DB_POOL_OVERFLOW.set(max(overflow, 0))
+
+        return connection
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        DB_POOL_CHECKED_OUT.dec()
+        DB_POOL_OVERFLOW.set(max(self.overflow(), 0))
+
+
+def engine_options(url: str, instrumented: bool = True) -> dict:
+    """Engine keyword arguments from Settings; pool statistics cover the primary"""
+
+    options = {
+        "echo": Config.DB_ECHO,
+        "poolclass": InstrumentedPool if instrumented else AsyncAdaptedQueuePool,
+        "pool_size": Config.DB_POOL_SIZE,
+        "max_overflow": Config.DB_MAX_OVERFLOW,
+        "pool_timeout": Config.DB_POOL_TIMEOUT,
+        "pool_recycle": Config.DB_POOL_RECYCLE,
+        "pool_pre_ping": Config.DB_POOL_PRE_PING,
+    }
+
+    if make_url(url).get_driver_name() == "asyncpg":
+        # 0 when running behind pgbouncer in transaction mode
+        options["connect_args"] = {"statement_cache_size": Config.DB_STATEMENT_CACHE_SIZE}
+
+    return options
+
 
 # Create an async engine
-async_engine = create_async_engine(
-    url=Config.DATABASE_URL, echo=True  # Add `echo=True` for debugging SQL queries, remove in production
+async_engine = create_async_engine(url=Config.DATABASE_URL, **engine_options(Config.DATABASE_URL))
+
+# created once: building a sessionmaker per request is wasted work
+async_session_factory = sessionmaker(
+    bind=async_engine, class_=AsyncSession, expire_on_commit=False
 )
 
+
+def get_pool_status() -> dict:
+    """This worker's pool: its configuration, current use and counters"""
+
+    pool = async_engine.pool
+    checkouts = pool_stats["checkouts"]
+
+    return {
+        "size": pool.size(),
+        "max_overflow": Config.DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        # negative while the pool has not opened all of its connections yet
+        "overflow": max(pool.overflow(), 0),
+        **pool_stats,
+        "wait_seconds_avg": pool_stats["wait_seconds_total"] / checkouts if checkouts else None,
+    }
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration: float = 0.0  # seconds spent waiting on the database
+
+
+# set per request (or per test) by `track_queries`; the object is shared with
+# the tasks and greenlets the request spawns, so they all add to the same one
+query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Count the statements executed, and the time they took, inside the block"""
+
+    stats = QueryStats()
+    token = query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        query_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_started"].pop()
+    stats = query_stats.get()
+
+    DB_QUERY_DURATION.observe(duration)
+
+    if stats is not None:
+        stats.count += 1
+        stats.duration += duration
+
+
+def _handle_error(exception_context):
+    # a failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Feed the engine's statements into the active `track_queries` block"""
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
+
+instrument_engine(async_engine)
+
 # Initialize the database (create tables)
 async def init_db() -> None:
     async with async_engine.begin() as conn:
@@ -15,11 +175,5 @@ async def init_db() -> None:
 
 # Dependency to get an async session
 async def get_session() -> AsyncSession:
-    # Configure the sessionmaker
-    async_session_factory = sessionmaker(
-        bind=async_engine, class_=AsyncSession, expire_on_commit=False
-    )
-
-    # Create and yield a session
     async with async_session_factory() as session:
         yield session
@@ -1,11 +1,16 @@
 import uuid
 from datetime import date, datetime
 from typing import List, Optional
+import sqlalchemy as sa
 import sqlalchemy.dialects.postgresql as pg
-from sqlmodel import Column, Field, Relationship, SQLModel
+from sqlalchemy import DDL, event, literal_column
+from sqlmodel import Column, Field, Index, Relationship, SQLModel
+
 
 class User(SQLModel, table=True):
     __tablename__ = 'users'
+    # every login and token refresh looks users up by email
+    __table_args__ = (sa.UniqueConstraint("email", name="uq_users_email"),)
 
     uid: uuid.UUID = Field(sa_column=Column(pg.UUID,nullable=False,primary_key=True,default=uuid.uuid4))
     username: str
@@ -19,11 +24,13 @@ class User(SQLModel, table=True):
     )
     created_at:datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
     updated_at:datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+    # loaded per query (see UserService.get_user_with_books), never implicitly:
+    # users are fetched on every authenticated request
     books: List["Book"] = Relationship(
-        back_populates="user", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="user", sa_relationship_kwargs={"lazy": "raise"}
     )
     reviews: List["Review"] = Relationship(
-        back_populates="user", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="user", sa_relationship_kwargs={"lazy": "raise"}
     )
     def __repr__(self):
         return f"<User {self.username}"
@@ -32,12 +39,16 @@ class User(SQLModel, table=True):
 # Tags models
 
 class BookTag(SQLModel, table=True):
+    # the primary key serves book -> tags; this serves tag -> books
+    __table_args__ = (Index("ix_booktag_tag_id_book_id", "tag_id", "book_id"),)
     book_id: uuid.UUID = Field(default=None, foreign_key="books.uid", primary_key=True)
     tag_id: uuid.UUID = Field(default=None, foreign_key="tags.uid", primary_key=True)
 
 
 class Tag(SQLModel, table=True):
     __tablename__ = "tags"
+    # tag upserts resolve names with INSERT ... ON CONFLICT (name)
+    __table_args__ = (sa.UniqueConstraint("name", name="uq_tags_name"),)
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
     )
@@ -56,8 +67,21 @@ class Tag(SQLModel, table=True):
 
 # Book Model
 
+# the Bayesian prior's mean: the middle of the 1-5 scale. It is fixed, since
+# it is also the rating_score column's server default (set by its migration)
+RATING_PRIOR_MEAN = 3.0
+
 class Book(SQLModel, table=True):
     __tablename__ = "books"
+    # keyset pagination indexes: one per sort key, uid breaks ties
+    __table_args__ = (
+        Index("ix_books_created_at_uid", "created_at", "uid"),
+        Index("ix_books_title_uid", "title", "uid"),
+        Index("ix_books_published_date_uid", "published_date", "uid"),
+        Index("ix_books_page_count_uid", "page_count", "uid"),
+        Index("ix_books_user_uid_created_at_uid", "user_uid", "created_at", "uid"),
+        Index("ix_books_rating_score_uid", "rating_score", "uid"),
+    )
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
     )
@@ -70,6 +94,18 @@ class Book(SQLModel, table=True):
     user_uid: Optional[uuid.UUID] = Field(default=None, foreign_key="users.uid")
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
     update_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+    # rating aggregates, updated with every review (see src/reviews/ratings.py)
+    rating_count: int = Field(default=0, sa_column=Column(sa.Integer, nullable=False, server_default="0"))
+    rating_sum: int = Field(default=0, sa_column=Column(sa.Integer, nullable=False, server_default="0"))
+    rating_1: int = Field(default=0, sa_column=Column(sa.Integer, nullable=False, server_default="0"))
+    rating_2: int = Field(default=0, sa_column=Column(sa.Integer, nullable=False, server_default="0"))
+    rating_3: int = Field(default=0, sa_column=Column(sa.Integer, nullable=False, server_default="0"))
+    rating_4: int = Field(default=0, sa_column=Column(sa.Integer, nullable=False, server_default="0"))
+    rating_5: int = Field(default=0, sa_column=Column(sa.Integer, nullable=False, server_default="0"))
+    rating_score: float = Field(
+        default=RATING_PRIOR_MEAN,
+        sa_column=Column(sa.Float, nullable=False, server_default=str(RATING_PRIOR_MEAN)),
+    )
     user: Optional[User] = Relationship(back_populates="books")
     reviews: List["Review"] = Relationship(
         back_populates="book", sa_relationship_kwargs={"lazy": "selectin"}
@@ -80,12 +116,55 @@ class Book(SQLModel, table=True):
         sa_relationship_kwargs={"lazy": "selectin"},
     )
 
+    @property
+    def rating_average(self) -> Optional[float]:
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    @property
+    def rating_histogram(self) -> List[int]:
+        return [self.rating_1, self.rating_2, self.rating_3, self.rating_4, self.rating_5]
+
     def __repr__(self):
         return f"<Book {self.title}>"
 
+
+# Full-text search vector over title, author and publisher. Postgres generates
+# it on every insert/update; it is left unmapped so loading books never pulls it.
+BOOK_SEARCH_VECTOR = literal_column("books.search_vector", pg.TSVECTOR)
+
+BOOK_SEARCH_VECTOR_DDL = [
+    "ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(author, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(publisher, '')), 'C')"
+    ") STORED",
+    "CREATE INDEX IF NOT EXISTS ix_books_search_vector ON books USING gin (search_vector)",
+]
+
+
+def _add_search_vector_ddl() -> None:
+    """Create the search vector with the table (metadata.create_all, tests)"""
+
+    for statement in BOOK_SEARCH_VECTOR_DDL:
+        event.listen(
+            Book.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql")
+        )
+
+
+_add_search_vector_ddl()
+
+
 # Reviews Model
 class Review(SQLModel, table=True):
     __tablename__ = "reviews"
+    # keyset pagination of a book's / a user's reviews by recency or rating
+    __table_args__ = (
+        Index("ix_reviews_book_uid_created_at_uid", "book_uid", "created_at", "uid"),
+        Index("ix_reviews_book_uid_rating_uid", "book_uid", "rating", "uid"),
+        Index("ix_reviews_user_uid_created_at_uid", "user_uid", "created_at", "uid"),
+        Index("ix_reviews_user_uid_rating_uid", "user_uid", "rating", "uid"),
+    )
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
     )
@@ -102,3 +181,26 @@ class Review(SQLModel, table=True):
         return f"<Review for book {self.book_uid} by user {self.user_uid}>"
 
 
+# Email outbox model
+class EmailOutbox(SQLModel, table=True):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+    uid: uuid.UUID = Field(
+        sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
+    )
+    recipients: List[str] = Field(sa_column=Column(sa.JSON, nullable=False))
+    subject: str
+    body: str
+    status: str = Field(default="pending")  # pending, sending, sent or failed
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = None
+    next_attempt_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+    created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+    sent_at: Optional[datetime] = Field(default=None, sa_column=Column(pg.TIMESTAMP, nullable=True))
+
+    def __repr__(self):
+        return f"<EmailOutbox {self.subject} {self.status}>"
+
+
@@ -1,18 +1,189 @@
 from src.config import Config
 import asyncio
+import logging
+import time
 import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import RedisError, TimeoutError as RedisTimeoutError
+from src.metrics import REDIS_COMMAND_DURATION
+logger = logging.getLogger(__name__)
 JTI_EXPIRY = 3600
 
-token_blocklist = redis.Redis(
+# revoked jti -> expiry timestamp, so workers can load the live blocklist
+BLOCKLIST_INDEX = "jti-blocklist:index"
+BLOCKLIST_CHANNEL = "jti-blocklist"
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_DURATION.labels("PIPELINE").observe(time.perf_counter() - started)
+
+
+class InstrumentedRedis(redis.Redis):
+    """Client that times every command and pipeline round trip"""
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_DURATION.labels(str(args[0]).upper()).observe(
+                time.perf_counter() - started
+            )
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
+token_blocklist = InstrumentedRedis(
     host = Config.REDIS_HOST,
     port = Config.REDIS_PORT,
     decode_responses=True
 )
 
+
+class BlocklistMirror:
+    """Per-worker copy of the revoked JTIs, kept current through Redis pub/sub.
+
+    Only tokens revoked within the last JTI_EXPIRY seconds are held, so the
+    mirror stays small without needing a probabilistic structure. While it is
+    not in sync (startup, lost subscription) lookups go to Redis directly.
+
+    The subscription is PINGed every `ping_interval` seconds; when nothing,
+    not even a PONG, arrives for `read_timeout` seconds (a half-open
+    connection) the mirror drops out of sync and resubscribes, so it never
+    vouches for a token while revocations may be going missing.
+    """
+
+    # seconds between attempts to resubscribe
+    retry_delay = 1
+    ping_interval = 5
+    read_timeout = 15
+    purge_interval = 60
+
+    def __init__(self) -> None:
+        self.revoked: dict[str, float] = {}
+        self.synced = False
+        self._task = None
+
+    def add(self, jti: str, expires_at: float) -> None:
+        self.revoked[jti] = expires_at
+
+    def contains(self, jti: str) -> bool:
+        expires_at = self.revoked.get(jti)
+
+        if expires_at is None:
+            return False
+
+        if expires_at <= time.time():
+            del self.revoked[jti]
+            return False
+
+        return True
+
+    def purge_expired(self) -> None:
+        now = time.time()
+        self.revoked = {
+            jti: expires_at for jti, expires_at in self.revoked.items() if expires_at > now
+        }
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.synced = False
+
+    async def _load(self) -> None:
+        now = time.time()
+        await token_blocklist.zremrangebyscore(BLOCKLIST_INDEX, "-inf", now)
+        entries = await token_blocklist.zrangebyscore(
+            BLOCKLIST_INDEX, now, "+inf", withscores=True
+        )
+        self.revoked = {jti: expires_at for jti, expires_at in entries}
+
+    async def _run(self) -> None:
+        while True:
+            pubsub = token_blocklist.pubsub()
+            try:
+                # subscribe before loading so no revocation falls in between
+                await pubsub.subscribe(BLOCKLIST_CHANNEL)
+                await self._load()
+                self.synced = True
+                await self._listen(pubsub)
+            except RedisError as e:
+                logger.warning("jti blocklist mirror lost sync: %s", e)
+            except Exception:
+                # lookups fall back to Redis meanwhile; never leave the task dead
+                logger.exception("jti blocklist mirror failed, resubscribing")
+            finally:
+                self.synced = False
+                try:
+                    await pubsub.aclose()
+                except RedisError:
+                    pass
+
+            await asyncio.sleep(self.retry_delay)
+
+    async def _listen(self, pubsub) -> None:
+        """Apply revocations until the subscription stops answering"""
+
+        last_heard = last_ping = last_purge = time.monotonic()
+
+        while True:
+            message = await pubsub.get_message(timeout=self.ping_interval)
+            now = time.monotonic()
+
+            if message is not None:
+                last_heard = now
+
+                if message["type"] == "message":
+                    self._apply(message["data"])
+            elif now - last_heard > self.read_timeout:
+                raise RedisTimeoutError(f"no reply on the subscription for {self.read_timeout}s")
+
+            if now - last_ping >= self.ping_interval:
+                await pubsub.ping()
+                last_ping = now
+
+            # also on a quiet channel, where no message would trigger it
+            if now - last_purge >= self.purge_interval:
+                self.purge_expired()
+                last_purge = now
+
+    def _apply(self, data) -> None:
+        try:
+            jti, expires_at = data.rsplit(" ", 1)
+            self.add(jti, float(expires_at))
+        except (AttributeError, ValueError):
+            logger.warning("ignoring malformed jti blocklist message %r", data)
+
+
+blocklist_mirror = BlocklistMirror()
+
+
 async def add_jti_to_blocklist(jti: str) -> None:
-    await token_blocklist.set(name=jti, value="", ex=JTI_EXPIRY)
+    expires_at = time.time() + JTI_EXPIRY
+
+    async with token_blocklist.pipeline(transaction=True) as pipe:
+        pipe.set(name=jti, value="", ex=JTI_EXPIRY)
+        pipe.zadd(BLOCKLIST_INDEX, {jti: expires_at})
+        pipe.publish(BLOCKLIST_CHANNEL, f"{jti} {expires_at}")
+        await pipe.execute()
+
+    blocklist_mirror.add(jti, expires_at)
 
 async def token_in_blocklist(jti:str) -> bool:
+    if blocklist_mirror.synced:
+        return blocklist_mirror.contains(jti)
+
     jti = await token_blocklist.get(jti)
 
     return jti is not None
@@ -3,6 +3,7 @@ from fastapi.requests import Request
 from fastapi.responses import JSONResponse
 from fastapi import FastAPI, status
 from sqlalchemy.exc import SQLAlchemyError
+from src.logs import logger
 
 class BooklyException(Exception):
     """This is the base class for all bookly errors"""
@@ -76,6 +77,18 @@ class UserNotFound(BooklyException):
     pass
 
 
+class ServerBusy(BooklyException):
+    """Server is at capacity for this kind of work and cannot queue more"""
+
+    pass
+
+
+class InvalidCursor(BooklyException):
+    """User has provided a pagination cursor that cannot be decoded"""
+
+    pass
+
+
 class AccountNotVerified(Exception):
     """Account not yet verified"""
     pass
@@ -218,6 +231,29 @@ def register_all_errors(app: FastAPI):
         ),
     )
 
+    app.add_exception_handler(
+        ServerBusy,
+        create_exception_handler(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            initial_detail={
+                "message": "Server is busy, please try again shortly",
+                "error_code": "server_busy",
+            },
+        ),
+    )
+
+    app.add_exception_handler(
+        InvalidCursor,
+        create_exception_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            initial_detail={
+                "message": "Invalid pagination cursor",
+                "resolution": "Use the next_cursor value returned by the previous page",
+                "error_code": "invalid_cursor",
+            },
+        ),
+    )
+
     app.add_exception_handler(
         AccountNotVerified,
         create_exception_handler(
@@ -244,7 +280,7 @@ def register_all_errors(app: FastAPI):
 
     @app.exception_handler(SQLAlchemyError)
     async def database__error(request, exc):
-        print(str(exc))
+        logger.error("database error", exc_info=exc)
         return JSONResponse(
             content={
                 "message": "Oops! Something went wrong",
@@ -0,0 +1,125 @@
+"""Structured JSON logging that keeps I/O and formatting off the event loop.
+
+Loggers under `bookly` (the access log is `bookly.access`) and the
+application modules' own loggers under `src` only put records on an
+in-process queue; a listener thread formats them as one JSON object
+per line and writes them to stdout. Every record made while a request is
+handled carries that request's id, which is also returned in the
+X-Request-ID response header (or taken from the same request header, when a
+proxy in front already set one).
+
+Successful requests can be sampled with ACCESS_LOG_SAMPLE_RATE; errors and
+requests slower than ACCESS_LOG_SLOW_MS are always logged.
+"""
+import json
+import logging
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from src.config import Config
+
+logger = logging.getLogger("bookly")
+access_logger = logging.getLogger("bookly.access")
+# modules log to logging.getLogger(__name__)
+module_logger = logging.getLogger("src")
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+
+class RequestQueueHandler(QueueHandler):
+    """Stamps the request id and enqueues the record untouched"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the base class formats here, on the caller's thread; the listener
+        # does it instead, and an in-process queue needs nothing pickled
+        record.request_id = request_id.get()
+        return record
+
+
+def new_request_id(header: Optional[str]) -> str:
+    # a forwarded id is only trusted when it looks like one
+    if header and len(header) <= 64 and header.isprintable():
+        return header
+
+    return uuid.uuid4().hex
+
+
+def should_log_request(status_code: int, duration: float) -> bool:
+    if not Config.ACCESS_LOG_ENABLED:
+        return False
+
+    if status_code >= 400 or duration * 1000 >= Config.ACCESS_LOG_SLOW_MS:
+        return True
+
+    return random.random() < Config.ACCESS_LOG_SAMPLE_RATE
+
+
+def start_logging(stream=None) -> None:
+    """Route the `bookly` and `src` loggers through the queue; once per worker process"""
+
+    global _listener
+
+    if _listener is not None:
+        return
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    # started after the worker forks: threads do not survive a fork
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+
+    handler = RequestQueueHandler(records)
+
+    for root in (logger, module_logger):
+        root.handlers = [handler]
+        root.setLevel(Config.LOG_LEVEL)
+        root.propagate = False
+
+
+def stop_logging() -> None:
+    """Write out what is still queued and stop the listener thread"""
+
+    global _listener
+
+    if _listener is None:
+        return
+
+    _listener.stop()
+    _listener = None
+
+    for root in (logger, module_logger):
+        root.handlers = []
+        root.propagate = True
@@ -0,0 +1,94 @@
+"""Prometheus metrics for the API, the database and Redis.
+
+Served at /metrics. With several uvicorn workers, point PROMETHEUS_MULTIPROC_DIR
+at an empty directory before starting them: every worker then writes its
+samples there and a scrape of any worker returns the sum over all of them.
+
+    rm -rf /tmp/bookly-metrics && mkdir /tmp/bookly-metrics
+    PROMETHEUS_MULTIPROC_DIR=/tmp/bookly-metrics uvicorn src:app --workers 4
+"""
+import os
+
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# sub-millisecond resolution for single statements and commands
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to produce the response, by route template",
+    ["method", "route"],
+)
+REQUESTS = Counter(
+    "http_requests_total", "Requests handled, by route template and status", ["method", "route", "status"]
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests being handled", ["method"], multiprocess_mode="livesum"
+)
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time", buckets=FAST_BUCKETS
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections in use", multiprocess_mode="livesum"
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Connections open beyond the pool size", multiprocess_mode="livesum"
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Time to check a connection out of the pool", buckets=FAST_BUCKETS
+)
+DB_POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that hit the pool timeout")
+
+REDIS_COMMAND_DURATION = Histogram(
+    "redis_command_duration_seconds", "Redis round trip time, by command", ["command"],
+    buckets=FAST_BUCKETS,
+)
+
+
+def route_template(scope: dict) -> str:
+    """The path template that matched (`/api/v1/books/{book_uid}`), never the raw path"""
+
+    # newer FastAPI resolves included routers lazily and keeps the full path here
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    if context is not None:
+        return context.path
+
+    route = scope.get("route")
+
+    # unmatched paths share one label so scanners cannot blow up cardinality
+    return route.path if route is not None else "unmatched"
+
+
+def _registry():
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def mark_worker_dead() -> None:
+    """Drop this worker's live gauges from the shared multiprocess files"""
+
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(generate_latest(_registry()), media_type=CONTENT_TYPE_LATEST)
@@ -3,26 +3,136 @@ from fastapi.requests import Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import time
 import logging
+from src.config import Config
+from src.db.main import track_queries
+from src.db.replicas import mark_recent_write, request_user_uid
+from src.metrics import REQUEST_DURATION, REQUESTS, REQUESTS_IN_PROGRESS, route_template
+from src.logs import access_logger, new_request_id, request_id, should_log_request
 
 logger = logging.getLogger('uvicorn.access')
 logger.disabled = True
 
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Plain ASGI middleware: they run in the request's own task and only wrap
+# `send`, so streamed responses pass through untouched. Starlette's
+# @app.middleware('http') would buffer every response through an extra task
+# and memory stream.
+
+
+class ObserveRequestsMiddleware:
+    """Assigns the request id, records the request metrics and writes the access log"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        request_uid = new_request_id(Headers(scope=scope).get("X-Request-ID"))
+        token = request_id.set(request_uid)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = request_uid
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            duration = time.perf_counter() - started
+            in_progress.dec()
+            # the route is only known once routing has run
+            route = route_template(scope)
+            REQUEST_DURATION.labels(method, route).observe(duration)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+
+            if should_log_request(status_code, duration):
+                client = scope.get("client")
+                access_logger.info("request", extra={
+                    "method": method,
+                    "route": route,
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round(duration * 1000, 2),
+                    "user_uid": request_user_uid(Request(scope)),
+                    "client": client[0] if client else None,
+                })
+
+            request_id.reset(token)
+
+
+class ReadYourWritesMiddleware:
+    """Sends a user's reads to the primary for a while after they wrote"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_after_marking(message: Message) -> None:
+            # before the response goes out, so the user's next read sees the write
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                user_uid = request_user_uid(Request(scope))
+                if user_uid is not None:
+                    await mark_recent_write(user_uid)
+
+            await send(message)
+
+        await self.app(scope, receive, send_after_marking)
+
+
+class QueryStatsMiddleware:
+    """Adds X-Query-Count / X-Query-Time response headers"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            async def send_with_stats(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers["X-Query-Count"] = str(stats.count)
+                    headers["X-Query-Time"] = f"{stats.duration * 1000:.2f}ms"
+
+                await send(message)
+
+            await self.app(scope, receive, send_with_stats)
+
 
 def register_middleware(app: FastAPI):
-    
-    @app.middleware('http')
-    async def custom_logging(request: Request, call_next):
-        start_time = time.time()
+    # the last one added runs first
 
-        response = await call_next(request)
-        processing_time = time.time() - start_time
+    if Config.DEBUG:
+        app.add_middleware(QueryStatsMiddleware)
 
-        message = f"host-{request.client.host} :port- {request.client.port} - method-{request.method} - path-{request.url.path} - status-{response.status_code} - completed after-{processing_time}s"
+    if Config.DATABASE_REPLICA_URLS:
+        app.add_middleware(ReadYourWritesMiddleware)
 
-        print(message)
-        return response
+    app.add_middleware(ObserveRequestsMiddleware)
     
     # @app.middleware('http')
     # async def authorization(request: Request, call_next):
@@ -45,6 +155,7 @@ def register_middleware(app: FastAPI):
         allow_credentials = True,
     )
 
+    # outermost: a request for a foreign host is turned away before anything else runs
     app.add_middleware(
         TrustedHostMiddleware,
         allowed_hosts=["localhost", "127.0.0.1"]
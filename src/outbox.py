@@ -0,0 +1,253 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formataddr
+from typing import List, Optional
+
+import aiosmtplib
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import Config
+from src.db.main import async_session_factory
+from src.db.models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+async def enqueue_message(
+    recipients: List[str], subject: str, body: str, session: AsyncSession
+) -> EmailOutbox:
+    """Add an email to the outbox in the caller's transaction.
+
+    Nothing is committed here: the caller commits the message together with
+    the change it is about (a new user, a reset request), so either both are
+    stored or neither is, and then sets `outbox_worker.wake`.
+    """
+
+    message = EmailOutbox(recipients=recipients, subject=subject, body=body)
+
+    session.add(message)
+    await session.flush()
+
+    return message
+
+
+async def get_outbox_status(session: AsyncSession) -> dict:
+    """Count outbox messages per delivery status"""
+
+    statement = select(EmailOutbox.status, func.count()).group_by(EmailOutbox.status)
+    result = await session.execute(statement)
+    counts = {"pending": 0, "sending": 0, "sent": 0, "failed": 0, **dict(result.all())}
+
+    oldest = await session.execute(
+        select(func.min(EmailOutbox.created_at)).where(EmailOutbox.status == "pending")
+    )
+    oldest_pending = oldest.scalar()
+
+    return {
+        **counts,
+        "oldest_pending_at": oldest_pending.isoformat() if oldest_pending else None,
+    }
+
+
+class SMTPSender:
+    """Sends emails over one SMTP connection that is kept open between batches"""
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        from_address: str,
+        from_name: str = "",
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        start_tls: bool = False,
+        use_tls: bool = False,
+        validate_certs: bool = True,
+    ) -> None:
+        self.hostname = hostname
+        self.port = port
+        self.from_address = from_address
+        self.from_name = from_name
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.use_tls = use_tls
+        self.validate_certs = validate_certs
+        self.smtp: Optional[aiosmtplib.SMTP] = None
+        self.connections = 0
+
+    @classmethod
+    def from_config(cls) -> "SMTPSender":
+        return cls(
+            hostname=Config.MAIL_SERVER,
+            port=Config.MAIL_PORT,
+            from_address=Config.MAIL_FROM,
+            from_name=Config.MAIL_FROM_NAME,
+            username=Config.MAIL_USERNAME if Config.USE_CREDENTIALS else None,
+            password=Config.MAIL_PASSWORD if Config.USE_CREDENTIALS else None,
+            start_tls=Config.MAIL_STARTTLS,
+            use_tls=Config.MAIL_SSL_TLS,
+            validate_certs=Config.VALIDATE_CERTS,
+        )
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            start_tls=self.start_tls,
+            use_tls=self.use_tls,
+            validate_certs=self.validate_certs,
+        )
+        await smtp.connect()
+        self.connections += 1
+        self.smtp = smtp
+        return smtp
+
+    def build_message(self, recipients: List[str], subject: str, body: str) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = formataddr((self.from_name, self.from_address))
+        message["To"] = ", ".join(recipients)
+        message["Subject"] = subject
+        message.set_content(body, subtype="html")
+        return message
+
+    async def send(self, recipients: List[str], subject: str, body: str) -> None:
+        message = self.build_message(recipients, subject, body)
+
+        smtp = self.smtp
+        if smtp is None or not smtp.is_connected:
+            smtp = await self._connect()
+
+        try:
+            await smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # the server closed an idle connection; one reconnect is enough
+            smtp = await self._connect()
+            await smtp.send_message(message)
+
+    async def close(self) -> None:
+        if self.smtp is not None and self.smtp.is_connected:
+            try:
+                await self.smtp.quit()
+            except aiosmtplib.SMTPException:
+                self.smtp.close()
+        self.smtp = None
+
+
+class OutboxWorker:
+    """Background task that delivers pending outbox emails in batches.
+
+    Rows are claimed with FOR UPDATE SKIP LOCKED and marked as sending in a
+    short transaction of their own, so every uvicorn worker can run one of
+    these without sending a message twice, and no row lock is held while
+    SMTP is slow. A claim is a lease: rows of a worker that died mid-batch
+    become due again after OUTBOX_CLAIM_TIMEOUT. Failed sends are retried
+    with exponential backoff until OUTBOX_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, session_factory, sender: SMTPSender) -> None:
+        self.session_factory = session_factory
+        self.sender = sender
+        self.wake = asyncio.Event()
+        self._task = None
+
+    def backoff(self, attempts: int) -> timedelta:
+        seconds = Config.OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1)
+        return timedelta(seconds=min(seconds, Config.OUTBOX_BACKOFF_MAX))
+
+    async def claim(self) -> List[EmailOutbox]:
+        """Lease a batch of due messages to this worker"""
+
+        async with self.session_factory() as session:
+            statement = (
+                select(EmailOutbox)
+                .where(EmailOutbox.status.in_(("pending", "sending")))
+                .where(EmailOutbox.next_attempt_at <= datetime.now())
+                .order_by(EmailOutbox.next_attempt_at)
+                .limit(Config.OUTBOX_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            result = await session.execute(statement)
+            messages = result.scalars().all()
+
+            lease_until = datetime.now() + timedelta(seconds=Config.OUTBOX_CLAIM_TIMEOUT)
+            for message in messages:
+                message.status = "sending"
+                message.next_attempt_at = lease_until
+
+            await session.commit()
+
+        return messages
+
+    async def run_once(self) -> int:
+        """Send one batch of due messages and return how many were attempted"""
+
+        messages = await self.claim()
+        outcomes = []
+
+        for message in messages:
+            try:
+                await self.sender.send(message.recipients, message.subject, message.body)
+                outcomes.append((message, None))
+            except (aiosmtplib.SMTPException, OSError) as e:
+                outcomes.append((message, e))
+
+        async with self.session_factory() as session:
+            for message, error in outcomes:
+                session.add(message)
+
+                if error is None:
+                    message.status = "sent"
+                    message.sent_at = datetime.now()
+                    message.last_error = None
+                    continue
+
+                message.attempts += 1
+                message.last_error = str(error)[:500]
+
+                if message.attempts >= Config.OUTBOX_MAX_ATTEMPTS:
+                    message.status = "failed"
+                    logger.error("giving up on email %s: %s", message.uid, error)
+                else:
+                    message.status = "pending"
+                    message.next_attempt_at = datetime.now() + self.backoff(message.attempts)
+
+            await session.commit()
+
+        return len(messages)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                sent = await self.run_once()
+            except Exception as e:
+                logger.warning("email outbox batch failed: %s", e)
+                sent = 0
+
+            if sent < Config.OUTBOX_BATCH_SIZE:
+                self.wake.clear()
+                try:
+                    await asyncio.wait_for(self.wake.wait(), Config.OUTBOX_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.sender.close()
+
+
+outbox_worker = OutboxWorker(
+    session_factory=async_session_factory,
+    sender=SMTPSender.from_config(),
+)
@@ -0,0 +1,105 @@
+import base64
+import json
+import uuid
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import tuple_
+
+from src.errors import InvalidCursor
+
+
+def _parse_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def _parse_date(value: str) -> date:
+    return date.fromisoformat(value)
+
+
+def _serialize(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+VALUE_PARSERS: Dict[type, Callable[[Any], Any]] = {
+    datetime: _parse_datetime,
+    date: _parse_date,
+    int: int,
+    float: float,
+    str: str,
+}
+
+
+def encode_cursor(sort: str, order: str, value: Any, uid: uuid.UUID) -> str:
+    """Build an opaque cursor pointing just after the given row"""
+
+    payload = json.dumps([sort, order, _serialize(value), str(uid)], separators=(",", ":"))
+
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(
+    cursor: str, sort: str, order: str, value_type: type
+) -> Tuple[Any, uuid.UUID]:
+    """Decode a cursor made by `encode_cursor` for the same sort and order"""
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, cursor_order, value, uid = json.loads(
+            base64.urlsafe_b64decode(padded.encode())
+        )
+        if cursor_sort != sort or cursor_order != order:
+            raise InvalidCursor()
+
+        return VALUE_PARSERS[value_type](value), uuid.UUID(uid)
+    except InvalidCursor:
+        raise
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor()
+
+
+def keyset_page(
+    statement,
+    sort_column,
+    uid_column,
+    sort: str,
+    order: str,
+    limit: int,
+    cursor: Optional[str],
+    value_type: type,
+):
+    """Restrict and order a select so it returns one keyset page.
+
+    The statement fetches `limit + 1` rows so the caller can tell whether a
+    next page exists without a separate count query.
+    """
+
+    if cursor:
+        value, uid = decode_cursor(cursor, sort, order, value_type)
+        row_key = tuple_(sort_column, uid_column)
+
+        if order == "desc":
+            statement = statement.where(row_key < tuple_(value, uid))
+        else:
+            statement = statement.where(row_key > tuple_(value, uid))
+
+    if order == "desc":
+        statement = statement.order_by(sort_column.desc(), uid_column.desc())
+    else:
+        statement = statement.order_by(sort_column.asc(), uid_column.asc())
+
+    return statement.limit(limit + 1)
+
+
+def next_cursor(rows: list, limit: int, sort: str, order: str, attribute: str):
+    """Trim the look-ahead row and return the cursor for the following page"""
+
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+
+    return rows, encode_cursor(sort, order, getattr(last, attribute), last.uid)
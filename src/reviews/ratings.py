@@ -0,0 +1,143 @@
+"""Per-book rating aggregates.
+
+Every book carries its review count, rating sum, a 1-5 star histogram and a
+Bayesian average (`rating_score`) that books can be sorted by. Reviews
+update them incrementally, in the same transaction that stores the review;
+`backfill_ratings` recomputes them from the reviews table, for existing data
+or after changing the prior's weight.
+
+    python -m src.reviews.ratings
+"""
+import asyncio
+import json
+import time
+import uuid
+from typing import List
+
+from sqlalchemy import exists, func, or_, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import Config
+from src.db.models import RATING_PRIOR_MEAN, Book, Review
+
+RATINGS = range(1, 6)
+
+# book tags per invalidate_tags call, so one pipeline stays small
+INVALIDATION_BATCH_SIZE = 1000
+
+
+def bayesian_score(count, total):
+    """Average rating pulled toward the prior mean until a book has enough reviews.
+
+    Works on numbers as well as on SQL expressions.
+    """
+
+    return (Config.RATING_PRIOR_WEIGHT * RATING_PRIOR_MEAN + total) / (
+        Config.RATING_PRIOR_WEIGHT + count
+    )
+
+
+def rating_increment(rating: int) -> dict:
+    """UPDATE values that add one review with the given rating to a book"""
+
+    return {
+        "rating_count": Book.rating_count + 1,
+        "rating_sum": Book.rating_sum + rating,
+        f"rating_{rating}": getattr(Book, f"rating_{rating}") + 1,
+        # SET expressions see the old row, so this uses the new totals
+        "rating_score": bayesian_score(Book.rating_count + 1, Book.rating_sum + rating),
+    }
+
+
+async def add_rating(book_uid, rating: int, session: AsyncSession) -> None:
+    """Count a new review; runs in the caller's transaction"""
+
+    statement = (
+        update(Book)
+        .where(Book.uid == book_uid)
+        .values(**rating_increment(rating))
+        .execution_options(synchronize_session=False)
+    )
+
+    await session.execute(statement)
+
+
+async def backfill_ratings(session: AsyncSession) -> List[uuid.UUID]:
+    """Recompute every book's aggregates from its reviews, in one transaction.
+
+    Returns the uids of the books it rewrote.
+    """
+
+    stats = (
+        select(
+            Review.book_uid,
+            func.count().label("review_count"),
+            func.sum(Review.rating).label("rating_total"),
+            *[func.count().filter(Review.rating == n).label(f"rating_{n}") for n in RATINGS],
+        )
+        .where(Review.book_uid.is_not(None))
+        .group_by(Review.book_uid)
+        .subquery()
+    )
+
+    # books that lost (or never had) reviews but still carry aggregates
+    reset = await session.execute(
+        update(Book)
+        .where(~exists().where(Review.book_uid == Book.uid))
+        .where(or_(Book.rating_count != 0, Book.rating_score != RATING_PRIOR_MEAN))
+        .values(
+            rating_count=0,
+            rating_sum=0,
+            **{f"rating_{n}": 0 for n in RATINGS},
+            rating_score=RATING_PRIOR_MEAN,
+        )
+        .returning(Book.uid)
+        .execution_options(synchronize_session=False)
+    )
+    book_uids = list(reset.scalars())
+
+    rescored = await session.execute(
+        update(Book)
+        .where(Book.uid == stats.c.book_uid)
+        .values(
+            rating_count=stats.c.review_count,
+            rating_sum=stats.c.rating_total,
+            **{f"rating_{n}": stats.c[f"rating_{n}"] for n in RATINGS},
+            rating_score=bayesian_score(stats.c.review_count, stats.c.rating_total),
+        )
+        .returning(Book.uid)
+        .execution_options(synchronize_session=False)
+    )
+    book_uids.extend(rescored.scalars())
+
+    await session.commit()
+
+    return book_uids
+
+
+async def main() -> None:
+    from src.db.cache import cache_uid, invalidate_tags
+    from src.db.main import async_engine
+
+    started = time.perf_counter()
+
+    async with AsyncSession(async_engine) as session:
+        book_uids = await backfill_ratings(session)
+
+    # book lists, then each rewritten book's detail
+    await invalidate_tags("books")
+    for start in range(0, len(book_uids), INVALIDATION_BATCH_SIZE):
+        batch = book_uids[start:start + INVALIDATION_BATCH_SIZE]
+        await invalidate_tags(*[f"book:{cache_uid(uid)}" for uid in batch])
+
+    print(json.dumps({
+        "books_updated": len(book_uids),
+        "seconds": round(time.perf_counter() - started, 2),
+    }))
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
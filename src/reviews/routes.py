@@ -1,17 +1,56 @@
-from fastapi import APIRouter,Depends
-from src.db.models import User
+from typing import Optional
+
+from fastapi import APIRouter,Depends,Query,Response
+from src.auth.schemas import UserPrincipalModel
 from src.db.main import get_session
+from src.db.replicas import get_read_session
 from sqlmodel.ext.asyncio.session import AsyncSession
-from .schemas import ReviewCreateModel
+from src.books.schemas import SortOrder
+from .schemas import ReviewCreateModel, ReviewPageModel, ReviewSortKey
 from .service import ReviewService
-from src.auth.dependencies import get_current_user
+from src.auth.dependencies import RoleChecker, get_current_user
+from src.responses import fast_response
 
 review_service = ReviewService()
 
 review_router = APIRouter()
+user_role_checker = Depends(RoleChecker(["user", "admin"]))
+
+
+@review_router.get("/book/{book_uid}", response_model=ReviewPageModel, dependencies=[user_role_checker])
+async def get_book_reviews(
+    book_uid: str,
+    response: Response,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    sort: ReviewSortKey = "created_at",
+    order: SortOrder = "desc",
+    session: AsyncSession = Depends(get_read_session),
+):
+    reviews = await review_service.get_book_reviews(
+        book_uid, session, limit=limit, cursor=cursor, sort=sort, order=order
+    )
+    return fast_response(reviews, response)
+
+
+@review_router.get("/user/{user_uid}", response_model=ReviewPageModel, dependencies=[user_role_checker])
+async def get_user_reviews(
+    user_uid: str,
+    response: Response,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    sort: ReviewSortKey = "created_at",
+    order: SortOrder = "desc",
+    session: AsyncSession = Depends(get_read_session),
+):
+    reviews = await review_service.get_user_reviews(
+        user_uid, session, limit=limit, cursor=cursor, sort=sort, order=order
+    )
+    return fast_response(reviews, response)
+
 
 @review_router.post("/book/{book_uid}")
-async def add_review_to_books(book_uid:str, review_data: ReviewCreateModel, current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
+async def add_review_to_books(book_uid:str, review_data: ReviewCreateModel, current_user: UserPrincipalModel = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
 
     new_review = await review_service.add_review_to_book(user_email=current_user.email, review_data=review_data,book_uid=book_uid,session=session)
 
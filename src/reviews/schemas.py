@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 import uuid
 
 class ReviewModel(BaseModel):
@@ -13,8 +13,16 @@ class ReviewModel(BaseModel):
     update_at: datetime
 
 
+ReviewSortKey = Literal["created_at", "rating"]
+
+
+class ReviewPageModel(BaseModel):
+    items: List[ReviewModel]
+    next_cursor: Optional[str] = None
+
+
 class ReviewCreateModel(BaseModel):
-    rating: int = Field(lt=6)
+    rating: int = Field(ge=1, lt=6)
     review_text: str
 
 
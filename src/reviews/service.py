@@ -1,8 +1,16 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import select
+
+from src.db.cache import cache_uid, invalidate_tags, read_through
 from src.db.models import Review
 from src.auth.service import UserService
 from src.books.service import BookService
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.reviews.schemas import ReviewCreateModel,ReviewModel
+from src.reviews.schemas import ReviewCreateModel,ReviewModel,ReviewPageModel
+from src.reviews.ratings import add_rating
+from src.pagination import keyset_page, next_cursor
 from fastapi.exceptions import HTTPException
 from fastapi import status
 
@@ -10,8 +18,90 @@ from fastapi import status
 book_service = BookService()
 user_service = UserService()
 
+# sort key -> (column, python type of the cursor value)
+# each key is backed by (book_uid, column, uid) and (user_uid, column, uid) indexes
+REVIEW_SORT_KEYS = {
+    "created_at": (Review.created_at, datetime),
+    "rating": (Review.rating, int),
+}
+
 class ReviewService:
 
+    async def _get_reviews_page(
+        self,
+        statement,
+        session: AsyncSession,
+        limit: int,
+        cursor: Optional[str],
+        sort: str,
+        order: str,
+    ):
+        sort_column, value_type = REVIEW_SORT_KEYS[sort]
+
+        statement = keyset_page(
+            statement,
+            sort_column,
+            Review.uid,
+            sort=sort,
+            order=order,
+            limit=limit,
+            cursor=cursor,
+            value_type=value_type,
+        )
+
+        result = await session.execute(statement)
+        reviews, cursor = next_cursor(
+            list(result.scalars().all()), limit, sort, order, attribute=sort_column.key
+        )
+
+        page = ReviewPageModel.model_validate(
+            {"items": reviews, "next_cursor": cursor}, from_attributes=True
+        )
+
+        return page.model_dump(mode="json")
+
+    async def get_book_reviews(
+        self,
+        book_uid: str,
+        session: AsyncSession,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        sort: str = "created_at",
+        order: str = "desc",
+    ):
+        statement = select(Review).where(Review.book_uid == book_uid)
+        book_key = f"book:{cache_uid(book_uid)}"
+
+        return await read_through(
+            key=f"reviews:{book_key}:{sort}:{order}:{limit}:{cursor or ''}",
+            tags=[book_key],
+            session=session,
+            loader=lambda: self._get_reviews_page(
+                statement, session, limit, cursor, sort, order
+            ),
+        )
+
+    async def get_user_reviews(
+        self,
+        user_uid: str,
+        session: AsyncSession,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        sort: str = "created_at",
+        order: str = "desc",
+    ):
+        statement = select(Review).where(Review.user_uid == user_uid)
+        user_key = f"user-reviews:{cache_uid(user_uid)}"
+
+        return await read_through(
+            key=f"{user_key}:{sort}:{order}:{limit}:{cursor or ''}",
+            tags=[user_key],
+            session=session,
+            loader=lambda: self._get_reviews_page(
+                statement, session, limit, cursor, sort, order
+            ),
+        )
+
     async def add_review_to_book(self, user_email:str, book_uid: str, review_data: ReviewCreateModel, session: AsyncSession):
         try:
             book = await book_service.get_book(book_uid=book_uid,session=session)
@@ -28,8 +118,18 @@ class ReviewService:
             new_review.user = user
             new_review.book = book
             session.add(new_review)
+            # same transaction: the aggregates never disagree with the reviews
+            await add_rating(book.uid, new_review.rating, session)
             await session.commit()
 
+            # book details embed their reviews; every book response has the ratings
+            await invalidate_tags(
+                "books",
+                f"book:{book.uid}",
+                f"user-books:{cache_uid(book.user_uid)}",
+                f"user-reviews:{cache_uid(user.uid)}",
+            )
+
             return new_review
         except Exception as e:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,detail="Oops .... Something went wrong")
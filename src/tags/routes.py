@@ -1,14 +1,17 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, Response, status
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 from src.auth.dependencies import RoleChecker
 from src.books.schemas import Book
+from src.conditional import conditional_get
+from src.responses import fast_response
 from src.db.main import get_session
+from src.db.replicas import get_read_session
 
-from .schemas import TagAddModel, TagCreateModel, TagModel
+from .schemas import BookTagsAddModel, BookTagsResultModel, TagAddModel, TagCreateModel, TagModel
 from .service import TagService
 
 tags_router = APIRouter()
@@ -17,10 +20,18 @@ user_role_checker = Depends(RoleChecker(["user", "admin"]))
 
 
 @tags_router.get("/", response_model=List[TagModel], dependencies=[user_role_checker])
-async def get_all_tags(session: AsyncSession = Depends(get_session)):
-    tags = await tag_service.get_tags(session)
+async def get_all_tags(
+    request: Request, response: Response, session: AsyncSession = Depends(get_read_session)
+):
+    tags = await conditional_get(
+        request,
+        response,
+        tags=["tags"],
+        loader=lambda: tag_service.get_tags(session),
+        session=session,
+    )
 
-    return tags
+    return fast_response(tags, response)
 
 
 @tags_router.post(
@@ -52,6 +63,16 @@ async def add_tags_to_book(
     return book_with_tag
 
 
+@tags_router.post(
+    "/books", response_model=BookTagsResultModel, dependencies=[user_role_checker]
+)
+async def add_tags_to_books(
+    tag_data: BookTagsAddModel, session: AsyncSession = Depends(get_session)
+) -> dict:
+
+    return await tag_service.add_tags_to_books(tag_data=tag_data, session=session)
+
+
 @tags_router.put(
     "/{tag_uid}", response_model=TagModel, dependencies=[user_role_checker]
 )
@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 from typing import List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class TagModel(BaseModel):
@@ -16,4 +16,14 @@ class TagCreateModel(BaseModel):
 
 
 class TagAddModel(BaseModel):
-    tags: List[TagCreateModel]
\ No newline at end of file
+    tags: List[TagCreateModel]
+
+
+class BookTagsAddModel(BaseModel):
+    book_uids: List[uuid.UUID] = Field(min_length=1, max_length=1000)
+    tags: List[TagCreateModel] = Field(min_length=1, max_length=100)
+
+
+class BookTagsResultModel(BaseModel):
+    tagged_books: int
+    tags: List[TagModel]
\ No newline at end of file
@@ -1,15 +1,26 @@
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List
+
 from fastapi import status
 from fastapi.exceptions import HTTPException
+from pydantic import TypeAdapter
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import raiseload
 from sqlmodel import desc, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from src.books.service import BookService
-from src.db.models import Tag
+from src.db.cache import cache_uid, invalidate_tags, read_through
+from src.db.models import Book, BookTag, Tag
 
-from .schemas import TagAddModel, TagCreateModel
+from .schemas import BookTagsAddModel, TagAddModel, TagCreateModel, TagModel
 from src.errors import BookNotFound, TagNotFound,TagAlreadyExists
 
-book_service = BookService()
+tag_list_adapter = TypeAdapter(List[TagModel])
+
+# keeps each upsert well under the driver's bind parameter limit
+TAG_UPSERT_BATCH_SIZE = 1000
 
 
 server_error = HTTPException(
@@ -22,34 +33,107 @@ class TagService:
     async def get_tags(self, session: AsyncSession):
         """Get all tags"""
 
-        statement = select(Tag).order_by(desc(Tag.created_at))
+        async def load_tags():
+            statement = (
+                select(Tag).options(raiseload(Tag.books)).order_by(desc(Tag.created_at))
+            )
 
-        result = await session.exec(statement)
+            result = await session.exec(statement)
+
+            return tag_list_adapter.dump_python(
+                tag_list_adapter.validate_python(result.all(), from_attributes=True),
+                mode="json",
+            )
 
-        return result.all()
+        return await read_through(key="tags:all", tags=["tags"], session=session, loader=load_tags)
 
     async def add_tags_to_book(
         self, book_uid: str, tag_data: TagAddModel, session: AsyncSession
     ):
         """Add tags to a book"""
 
-        book = await book_service.get_book(book_uid=book_uid, session=session)
+        statement = (
+            select(Book)
+            .options(raiseload(Book.reviews), raiseload(Book.tags))
+            .where(Book.uid == book_uid)
+        )
+        result = await session.exec(statement)
+        book = result.first()
 
         if not book:
             raise BookNotFound()
 
-        for tag_item in tag_data.tags:
-            result = await session.exec(select(Tag).where(Tag.name == tag_item.name))
+        await self._tag_books([book.uid], [tag.name for tag in tag_data.tags], session)
+
+        return book
+
+    async def add_tags_to_books(self, tag_data: BookTagsAddModel, session: AsyncSession):
+        """Add the same tags to many books"""
+
+        book_uids = set(tag_data.book_uids)
 
-            tag = result.one_or_none()
-            if not tag:
-                tag = Tag(name=tag_item.name)
+        result = await session.exec(select(Book.uid).where(Book.uid.in_(book_uids)))
+
+        if len(result.all()) != len(book_uids):
+            raise BookNotFound()
 
-            book.tags.append(tag)
-        session.add(book)
+        tag_uids = await self._tag_books(
+            book_uids, [tag.name for tag in tag_data.tags], session
+        )
+
+        result = await session.exec(
+            select(Tag).options(raiseload(Tag.books)).where(Tag.uid.in_(tag_uids.values()))
+        )
+
+        return {"tagged_books": len(book_uids), "tags": result.all()}
+
+    async def upsert_tags(
+        self, names: Iterable[str], session: AsyncSession
+    ) -> Dict[str, uuid.UUID]:
+        """Map tag names to uids, creating the missing tags in bulk"""
+
+        # sorted so that concurrent upserts lock the tag rows in the same order
+        names = sorted(set(names))
+        tag_uids: Dict[str, uuid.UUID] = {}
+
+        for start in range(0, len(names), TAG_UPSERT_BATCH_SIZE):
+            statement = insert(Tag).values([
+                {"uid": uuid.uuid4(), "name": name, "created_at": datetime.now()}
+                for name in names[start:start + TAG_UPSERT_BATCH_SIZE]
+            ])
+            # a no-op update instead of DO NOTHING, so that RETURNING also
+            # yields the tags that already existed
+            statement = statement.on_conflict_do_update(
+                index_elements=["name"], set_={"name": statement.excluded.name}
+            ).returning(Tag.name, Tag.uid)
+
+            result = await session.execute(statement)
+            tag_uids.update(result.all())
+
+        return tag_uids
+
+    async def _tag_books(
+        self, book_uids: Iterable[uuid.UUID], names: List[str], session: AsyncSession
+    ) -> Dict[str, uuid.UUID]:
+        tag_uids = await self.upsert_tags(names, session)
+
+        if not tag_uids:
+            return tag_uids
+
+        # executemany: SQLAlchemy batches the rows into multi-row INSERTs
+        await session.execute(
+            insert(BookTag).on_conflict_do_nothing(),
+            [
+                {"book_id": book_uid, "tag_id": tag_uid}
+                for book_uid in book_uids
+                for tag_uid in tag_uids.values()
+            ],
+        )
         await session.commit()
-        await session.refresh(book)
-        return book
+
+        await invalidate_tags("tags", *[f"book:{cache_uid(uid)}" for uid in book_uids])
+
+        return tag_uids
 
     async def get_tag_by_uid(self, tag_uid: str, session: AsyncSession):
         """Get tag by uid"""
@@ -63,19 +147,18 @@ class TagService:
     async def add_tag(self, tag_data: TagCreateModel, session: AsyncSession):
         """Create a tag"""
 
-        statement = select(Tag).where(Tag.name == tag_data.name)
-
-        result = await session.exec(statement)
-
-        tag = result.first()
-
-        if tag:
-            raise TagAlreadyExists()
         new_tag = Tag(name=tag_data.name)
 
         session.add(new_tag)
 
-        await session.commit()
+        try:
+            await session.commit()
+        except IntegrityError:
+            # tags.name is unique; a concurrent request may have won the race
+            await session.rollback()
+            raise TagAlreadyExists()
+
+        await invalidate_tags("tags")
 
         return new_tag
 
@@ -94,20 +177,31 @@ class TagService:
         for k, v in update_data_dict.items():
             setattr(tag, k, v)
 
-            await session.commit()
+            try:
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+                raise TagAlreadyExists()
 
             await session.refresh(tag)
 
+        # book details embed tag names
+        await invalidate_tags("tags", *[f"book:{book.uid}" for book in tag.books])
+
         return tag
 
     async def delete_tag(self, tag_uid: str, session: AsyncSession):
         """Delete a tag"""
 
-        tag = self.get_tag_by_uid(tag_uid,session)
+        tag = await self.get_tag_by_uid(tag_uid,session)
 
         if not tag:
             raise TagNotFound()
 
+        affected_tags = ["tags", *[f"book:{book.uid}" for book in tag.books]]
+
         await session.delete(tag)
 
-        await session.commit()
\ No newline at end of file
+        await session.commit()
+
+        await invalidate_tags(*affected_tags)
\ No newline at end of file
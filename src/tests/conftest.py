@@ -1,4 +1,14 @@
-from src.db.main import get_session
+import asyncio
+from contextlib import contextmanager
+from datetime import date
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.db.main import get_session, instrument_engine, track_queries
+from src.middleware import QueryStatsMiddleware
+from src.db.models import Book, User
+from src.db.replicas import get_read_session
 from src.auth.dependencies import AccessTokenBearer, RoleChecker, RefreshTokenBearer
 from src import app
 from fastapi.testclient import TestClient
@@ -37,3 +47,105 @@ def test_client():
 @pytest.fixture
 def fake_book_service():
     return mock_book_service
+
+@pytest.fixture
+def counting_client():
+    """A test client whose responses carry X-Query-Count
+
+    The count covers everything the request ran, its dependencies and
+    middleware included (QueryStatsMiddleware wraps the whole app here).
+    """
+
+    return TestClient(QueryStatsMiddleware(app), base_url="http://localhost")
+
+@pytest.fixture
+def query_budget():
+    """Fail the test when a block executes more SQL statements than its budget
+
+        with query_budget(3):
+            response = test_client.get(...)
+
+    Statements are counted on instrumented engines (see `instrument_engine`).
+    """
+
+    @contextmanager
+    def budget(limit: int):
+        with track_queries() as stats:
+            yield stats
+
+        assert stats.count <= limit, (
+            f"{stats.count} queries executed, the budget is {limit}"
+        )
+
+    return budget
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    """A fresh SQLite database with every table, counted by `query_budget`
+
+    It lives in a file and keeps no pooled connections, so both the test's
+    own event loops and the test client's can use it.
+    """
+
+    pytest.importorskip("aiosqlite")
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/bookly.db", poolclass=NullPool)
+    instrument_engine(engine)
+
+    async def create_all():
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+
+    asyncio.run(create_all())
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def add_user_with_books(db_engine):
+    """Store a user and `count` books of theirs; returns (user, books)
+
+        user, (book,) = await add_user_with_books(tags=[Tag(name="scifi")])
+    """
+
+    async def add(count: int = 1, email: str = "hasanakash799@gmail.com", **book_fields):
+        user = User(
+            username=email.split("@")[0], email=email, first_name="jahid",
+            last_name="hasan", password_hash="hash", role="user",
+        )
+        async with AsyncSession(db_engine, expire_on_commit=False) as session:
+            session.add(user)
+            await session.commit()
+
+            books = [
+                Book(**{
+                    "title": "Dune" if count == 1 else f"Dune {i}",
+                    "author": "Frank Herbert", "publisher": "Chilton",
+                    "published_date": date(1965, 8, 1), "page_count": 412, "language": "en",
+                    "user_uid": user.uid,
+                    **book_fields,
+                })
+                for i in range(count)
+            ]
+            session.add_all(books)
+            await session.commit()
+
+        return user, books
+
+    return add
+
+
+@pytest.fixture
+def app_db(db_engine):
+    """Serve the app's requests, reads and writes, from `db_engine`"""
+
+    async def session():
+        async with AsyncSession(db_engine, expire_on_commit=False) as session:
+            yield session
+
+    previous = dict(app.dependency_overrides)
+    app.dependency_overrides.update({get_session: session, get_read_session: session})
+    yield db_engine
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(previous)
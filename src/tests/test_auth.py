@@ -1,4 +1,14 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import event
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.auth.cache import principal_cache
+from src.auth.dependencies import get_current_user
 from src.auth.schemas import UserCreateModel
+from src.auth.service import UserService
 
 auth_prefix = f"/api/v1/auth"
 
@@ -21,4 +31,126 @@ def test_user_creation(fake_session, fake_user_service, test_client):
     assert fake_user_service.user_exists_called_once_with(signup_data['email'],fake_session)
 
     assert fake_user_service.create_user_called_once()
-    assert fake_user_service.create_user_called_once_with(user_data,fake_session)
\ No newline at end of file
+    assert fake_user_service.create_user_called_once_with(user_data,fake_session)
+
+def test_auth_path_issues_one_query_and_then_none(db_engine, add_user_with_books):
+    engine = db_engine
+
+    async def run():
+        user, _ = await add_user_with_books()
+
+        statements = []
+        event.listen(
+            engine.sync_engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+        principal_cache.clear()
+        token_details = {
+            "user": {"email": user.email, "user_uid": str(user.uid), "role": "user"},
+            "exp": time.time() + 60,
+        }
+
+        async with AsyncSession(engine) as session:
+            principal = await get_current_user(token_details=token_details, session=session)
+            assert principal.uid == user.uid
+            # a lean load: no selectin for the user's books or reviews
+            assert len(statements) == 1
+
+            await get_current_user(token_details=token_details, session=session)
+            assert len(statements) == 1
+
+        statements.clear()
+        async with AsyncSession(engine) as session:
+            full_user = await UserService().get_user_with_books(user.email, session)
+            assert len(full_user.books) == 1
+            # user, books, reviews
+            assert len(statements) == 3
+
+    asyncio.run(run())
+
+
+def test_redis_principal_ttl_is_capped(monkeypatch):
+    import uuid
+
+    from src.auth import cache
+    from src.auth.schemas import UserPrincipalModel
+    from src.config import Config
+
+    writes = []
+
+    class FakeRedis:
+        async def set(self, name, value, ex):
+            writes.append(ex)
+
+    monkeypatch.setattr(cache, "redis_client", FakeRedis())
+    monkeypatch.setattr(Config, "PRINCIPAL_CACHE_REDIS", True)
+    principal = UserPrincipalModel(
+        uid=uuid.uuid4(), email="hasanakash799@gmail.com", role="user", is_verified=True
+    )
+
+    # a token valid for an hour: Redis keeps the principal no longer than locally
+    asyncio.run(cache.cache_principal(principal, time.time() + 3600))
+    # a token about to expire
+    asyncio.run(cache.cache_principal(principal, time.time() + 10.5))
+
+    assert Config.PRINCIPAL_CACHE_TTL - 1 <= writes[0] <= Config.PRINCIPAL_CACHE_TTL
+    assert writes[1] == 10
+    principal_cache.clear()
+
+
+def test_cached_token_claims_are_read_only():
+    from src.auth.utils import create_access_token, decode_token_cached
+
+    token = create_access_token({"email": "hasanakash799@gmail.com", "role": "user"})
+
+    first = decode_token_cached(token)
+    with pytest.raises(TypeError):
+        first["user"]["role"] = "admin"
+    with pytest.raises(TypeError):
+        first["refresh"] = True
+
+    assert decode_token_cached(token) is first
+    assert decode_token_cached(token)["user"]["role"] == "user"
+
+
+def test_login_is_shed_when_the_hash_queue_is_full(test_client, app_db, add_user_with_books, monkeypatch):
+    from src.auth import utils
+    from src.config import Config
+
+    asyncio.run(add_user_with_books())
+    monkeypatch.setattr(
+        utils, "pending_hashes", Config.PASSWORD_HASH_WORKERS + Config.PASSWORD_HASH_QUEUE_SIZE
+    )
+
+    response = test_client.post(
+        url=f"{auth_prefix}/login",
+        json={"email": "hasanakash799@gmail.com", "password": "jahidhasan"},
+        headers={"host": "localhost"},
+    )
+
+    assert response.status_code == 503
+    assert response.json()["error_code"] == "server_busy"
+
+
+def test_pending_hashes_is_released_on_success_and_on_error():
+    from src.auth import utils
+
+    hash = utils.generate_passwd_hash("jahidhasan")
+    seen = []
+
+    def verify(password, hash):
+        seen.append(utils.pending_hashes)
+        return utils.verify_password(password, hash)
+
+    async def run():
+        assert await utils._run_in_hash_executor(verify, "jahidhasan", hash)
+        assert utils.pending_hashes == 0
+
+        with pytest.raises(ValueError):
+            # passlib cannot identify the hash
+            await utils._run_in_hash_executor(verify, "jahidhasan", "not-a-hash")
+        assert utils.pending_hashes == 0
+
+    asyncio.run(run())
+    assert seen == [1, 1]
@@ -0,0 +1,168 @@
+import asyncio
+import time
+
+from src.db import redis as redis_module
+from src.db.redis import BlocklistMirror, token_in_blocklist
+
+
+class FakePubSub:
+    def __init__(self, messages, answers_pings=True):
+        self.messages = [{"type": "message", "data": data} for data in messages]
+        self.answers_pings = answers_pings
+        self.pings = 0
+
+    async def subscribe(self, channel):
+        self.messages.insert(0, {"type": "subscribe", "data": 1})
+
+    async def get_message(self, timeout):
+        if self.messages:
+            return self.messages.pop(0)
+
+        await asyncio.sleep(timeout)
+        return None
+
+    async def ping(self):
+        self.pings += 1
+        # a half-open connection takes the PING and never answers
+        if self.answers_pings:
+            self.messages.append({"type": "pong", "data": ""})
+
+    async def aclose(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self, messages, load_failures=0, answers_pings=True):
+        self.messages = messages
+        self.load_failures = load_failures
+        self.answers_pings = answers_pings
+        self.subscriptions = []
+        self.gets = []
+
+    def pubsub(self):
+        pubsub = FakePubSub(self.messages, self.answers_pings)
+        self.subscriptions.append(pubsub)
+        return pubsub
+
+    async def zremrangebyscore(self, *args):
+        if self.load_failures:
+            self.load_failures -= 1
+            raise RuntimeError("unexpected reply")
+
+    async def zrangebyscore(self, *args, withscores=False):
+        return [("loaded", time.time() + 60)]
+
+    async def get(self, name):
+        self.gets.append(name)
+        return "" if name == "revoked" else None
+
+
+async def wait_for_sync(mirror):
+    for _ in range(100):
+        if mirror.synced:
+            return
+        await asyncio.sleep(0.01)
+
+    raise AssertionError("the mirror never synced")
+
+
+def fast_mirror() -> BlocklistMirror:
+    mirror = BlocklistMirror()
+    mirror.retry_delay = 0
+    mirror.ping_interval = 0.01
+    mirror.read_timeout = 0.05
+    mirror.purge_interval = 0.01
+    return mirror
+
+
+def test_mirror_skips_malformed_messages(monkeypatch):
+    expires_at = time.time() + 60
+    fake = FakeRedis(["no-expiry", "bad not-a-number", None, f"good {expires_at}"])
+    monkeypatch.setattr(redis_module, "token_blocklist", fake)
+
+    async def run():
+        mirror = BlocklistMirror()
+        await mirror.start()
+        await wait_for_sync(mirror)
+        await asyncio.sleep(0.01)
+
+        assert mirror.synced
+        assert mirror.contains("loaded")
+        assert mirror.contains("good")
+        assert not mirror.contains("bad")
+        await mirror.stop()
+
+    asyncio.run(run())
+
+
+def test_mirror_resubscribes_after_unexpected_errors(monkeypatch):
+    monkeypatch.setattr(redis_module, "token_blocklist", FakeRedis([], load_failures=2))
+
+    async def run():
+        mirror = fast_mirror()
+        await mirror.start()
+        await wait_for_sync(mirror)
+
+        assert mirror.contains("loaded")
+        await mirror.stop()
+
+    asyncio.run(run())
+
+
+def test_lookups_go_to_redis_until_the_mirror_syncs(monkeypatch):
+    fake = FakeRedis([])
+    mirror = BlocklistMirror()
+    mirror.add("revoked", time.time() + 60)
+    monkeypatch.setattr(redis_module, "token_blocklist", fake)
+    monkeypatch.setattr(redis_module, "blocklist_mirror", mirror)
+
+    assert asyncio.run(token_in_blocklist("revoked"))
+    assert not asyncio.run(token_in_blocklist("other"))
+    assert fake.gets == ["revoked", "other"]
+
+    mirror.synced = True
+    assert asyncio.run(token_in_blocklist("revoked"))
+    assert not asyncio.run(token_in_blocklist("other"))
+    assert fake.gets == ["revoked", "other"]
+
+
+def test_mirror_drops_out_of_sync_on_a_silent_connection(monkeypatch):
+    fake = FakeRedis([], answers_pings=False)
+    monkeypatch.setattr(redis_module, "token_blocklist", fake)
+
+    async def run():
+        mirror = fast_mirror()
+        await mirror.start()
+        await wait_for_sync(mirror)
+
+        # no PONG within read_timeout: resubscribe, Redis answers meanwhile
+        for _ in range(100):
+            if len(fake.subscriptions) > 1:
+                break
+            await asyncio.sleep(0.01)
+
+        assert len(fake.subscriptions) > 1
+        assert fake.subscriptions[0].pings > 0
+        await mirror.stop()
+
+    asyncio.run(run())
+
+
+def test_mirror_stays_synced_and_purges_on_a_quiet_channel(monkeypatch):
+    fake = FakeRedis([])
+    monkeypatch.setattr(redis_module, "token_blocklist", fake)
+
+    async def run():
+        mirror = fast_mirror()
+        await mirror.start()
+        await wait_for_sync(mirror)
+        mirror.add("expired", time.time() - 1)
+
+        await asyncio.sleep(0.2)
+
+        assert mirror.synced
+        assert len(fake.subscriptions) == 1
+        assert "expired" not in mirror.revoked
+        await mirror.stop()
+
+    asyncio.run(run())
@@ -1,3 +1,22 @@
+import asyncio
+import csv
+import io
+import json
+import uuid
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.books.service import BookService
+from src.config import Config
+from src.db.models import Book, Review, Tag
+from src.errors import InvalidCursor
+from src.pagination import encode_cursor, decode_cursor
+from src.reviews.ratings import add_rating, backfill_ratings, bayesian_score
+
 books_prefix = f'/api/v1/books'
 
 def test_get_all_books(test_client,fake_book_service,fake_session):
@@ -9,3 +28,461 @@ def test_get_all_books(test_client,fake_book_service,fake_session):
     assert fake_book_service.get_all_books_called_once_with(fake_session)
 
 
+def test_book_cursor_round_trip():
+    uid = uuid.uuid4()
+    created_at = datetime(2025, 1, 3, 2, 20, 11)
+    cursor = encode_cursor("created_at", "desc", created_at, uid)
+
+    assert decode_cursor(cursor, "created_at", "desc", datetime) == (created_at, uid)
+
+
+def test_book_cursor_rejects_other_sort():
+    cursor = encode_cursor("title", "asc", "Dune", uuid.uuid4())
+
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "created_at", "desc", str)
+
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor", "title", "asc", str)
+
+
+def test_incremental_ratings_match_backfill(db_engine, add_user_with_books):
+    engine = db_engine
+
+    async def run():
+        user, (book,) = await add_user_with_books()
+
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            for rating in [5, 4, 5, 1]:
+                session.add(Review(
+                    rating=rating, review_text="...", user_uid=user.uid, book_uid=book.uid
+                ))
+                await add_rating(book.uid, rating, session)
+                await session.commit()
+
+        async with AsyncSession(engine) as session:
+            book = await session.get(Book, book.uid)
+            incremental = (book.rating_histogram, book.rating_average, book.rating_score)
+
+        assert incremental == ([1, 0, 0, 1, 2], 3.75, pytest.approx(bayesian_score(4, 15)))
+
+        async with AsyncSession(engine) as session:
+            assert await backfill_ratings(session) == [book.uid]
+
+        async with AsyncSession(engine) as session:
+            book = await session.get(Book, book.uid)
+            assert (book.rating_histogram, book.rating_average, book.rating_score) == incremental
+
+    asyncio.run(run())
+
+
+def test_book_detail_query_budget(query_budget, monkeypatch, db_engine, add_user_with_books):
+    monkeypatch.setattr(Config, "CACHE_ENABLED", False)
+    engine = db_engine
+
+    async def run():
+        user, (book,) = await add_user_with_books(tags=[Tag(name="scifi"), Tag(name="classic")])
+
+        async with AsyncSession(engine) as session:
+            session.add_all([
+                Review(rating=5, review_text="...", user_uid=user.uid, book_uid=book.uid)
+                for _ in range(Config.REVIEW_PREVIEW_SIZE * 3)
+            ])
+            await session.commit()
+
+        async with AsyncSession(engine) as session:
+            # book, its tags, the review preview: however many reviews it has
+            with query_budget(3):
+                detail = await BookService().get_book_detail(book.uid, session)
+
+        assert len(detail["reviews"]) == Config.REVIEW_PREVIEW_SIZE
+        assert len(detail["tags"]) == 2
+
+        async with AsyncSession(engine) as session:
+            with pytest.raises(AssertionError, match="budget is 2"):
+                with query_budget(2):
+                    await BookService().get_book_detail(book.uid, session)
+
+    asyncio.run(run())
+
+
+def test_get_book_leaves_reviews_unloaded(query_budget, monkeypatch, db_engine, add_user_with_books):
+    monkeypatch.setattr(Config, "CACHE_ENABLED", False)
+    engine = db_engine
+
+    async def run():
+        user, (book,) = await add_user_with_books()
+
+        async with AsyncSession(engine) as session:
+            session.add_all([
+                Review(rating=5, review_text="...", user_uid=user.uid, book_uid=book.uid)
+                for _ in range(20)
+            ])
+            await session.commit()
+
+        async with AsyncSession(engine) as session:
+            # the book and its tags
+            with query_budget(2):
+                found = await BookService().get_book(book.uid, session)
+
+            assert found.reviews == []
+
+            assert await BookService().delete_book(book.uid, session) == {}
+
+        async with AsyncSession(engine) as session:
+            result = await session.execute(select(Review.book_uid))
+            assert set(result.scalars().all()) == {None}
+
+    asyncio.run(run())
+
+
+def test_fast_response_matches_default_encoding(monkeypatch):
+    from fastapi import Response
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    from src.books.schemas import BookPageModel
+    from src.responses import fast_response
+
+    page = BookPageModel.model_validate({
+        "items": [{
+            "uid": uuid.uuid4(), "title": "Der Schattenfluss — Band 1", "author": "Jahid",
+            "publisher": "Bookly", "published_date": date(2001, 2, 3), "page_count": 320,
+            "language": "de", "created_at": datetime(2025, 1, 3, 2, 20, 11, 5),
+            "update_at": datetime(2025, 1, 3, 2, 20, 11), "rating_count": 3,
+            "rating_average": 4.333333333333333, "rating_score": 3.3076923076923075,
+        }],
+        "next_cursor": None,
+    }).model_dump(mode="json")
+
+    monkeypatch.setattr(Config, "FAST_RESPONSES", True)
+    response = Response(headers={"ETag": '"abc"'})
+    del response.headers["content-length"]
+    fast = fast_response(page, response)
+
+    # what FastAPI renders after validating against response_model
+    default = JSONResponse(jsonable_encoder(BookPageModel.model_validate(page)))
+
+    assert fast.body == default.body
+    assert fast.headers["ETag"] == '"abc"'
+
+
+def test_search_route_fast_path_matches_default(test_client, monkeypatch):
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock, Mock
+
+    from src import app
+    from src.books import routes as book_routes
+    from src.db.replicas import get_read_session
+
+    book = Book(
+        uid=uuid.uuid4(), title="Dune", author="Frank Herbert", publisher="Chilton",
+        published_date=date(1965, 8, 1), page_count=412, language="en",
+        user_uid=uuid.uuid4(), created_at=datetime(2025, 1, 3), update_at=datetime(2025, 1, 3),
+        rating_count=2, rating_sum=9, rating_1=0, rating_2=0, rating_3=0, rating_4=1,
+        rating_5=1, rating_score=3.5,
+    )
+    session = Mock()
+    session.execute = AsyncMock(
+        return_value=Mock(all=Mock(return_value=[SimpleNamespace(Book=book, rank=0.5)]))
+    )
+
+    async def read_session():
+        yield session
+
+    overrides = {
+        get_read_session: read_session,
+        book_routes.role_checker.dependency: lambda: True,
+        book_routes.access_token_bearer: lambda: {},
+    }
+    app.dependency_overrides.update(overrides)
+
+    def search():
+        return test_client.get(f"{books_prefix}/search?q=dune", headers={"host": "localhost"})
+
+    try:
+        default = search()
+        monkeypatch.setattr(Config, "FAST_RESPONSES", True)
+        fast = search()
+    finally:
+        for dependency in overrides:
+            app.dependency_overrides.pop(dependency, None)
+
+    assert default.status_code == fast.status_code == 200
+    assert fast.content == default.content
+
+    item = fast.json()["items"][0]
+    assert item["rating_average"] == 4.5
+    assert item["rating_histogram"] == [0, 0, 0, 1, 1]
+    assert "user_uid" not in item and "rating_sum" not in item
+
+
+def test_import_reports_bad_bytes_and_database_errors():
+    pytest.importorskip("aiosqlite")
+
+    from src.books.importer import BookImporter
+
+    async def body():
+        yield b'{"title": "Dune", "author": "Frank Herbert", "publisher": "Chilton", '
+        yield b'"published_date": "1965-08-01", "page_count": 412, "language": "en"}\n'
+        yield b'\xff\xfe not utf-8\n'
+
+    async def run():
+        # no tables: not the fault of any row, so the whole chunk fails
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with AsyncSession(engine) as session:
+            report = await BookImporter().import_stream(body(), "ndjson", str(uuid.uuid4()), session)
+        await engine.dispose()
+        return report
+
+    report = asyncio.run(run())
+
+    assert report["inserted"] == 0
+    assert report["failed"] == 2
+    assert {error["row"]: error["errors"][0]["type"] for error in report["errors"]} == {
+        1: "database_error",
+        2: "parse_error",
+    }
+
+
+def test_import_stores_the_rows_around_one_the_database_rejects(db_engine, add_user_with_books, monkeypatch):
+    monkeypatch.setattr(Config, "CACHE_ENABLED", False)
+
+    from sqlalchemy import text
+
+    from src.books.importer import BookImporter
+
+    def row(title, page_count=412):
+        return json.dumps({
+            "title": title, "author": "Frank Herbert", "publisher": "Chilton",
+            "published_date": "1965-08-01", "page_count": page_count, "language": "en",
+            "tags": ["scifi"],
+        }).encode() + b"\n"
+
+    async def body():
+        for i in range(1, 11):
+            yield row("rejected" if i == 7 else f"Dune {i}")
+        # caught by validation, before the database sees it
+        yield row("Dune 11", page_count=2**31)
+
+    async def run():
+        user, _ = await add_user_with_books(0)
+
+        async with db_engine.begin() as conn:
+            await conn.execute(text(
+                "CREATE TRIGGER reject_book BEFORE INSERT ON books WHEN NEW.title = 'rejected' "
+                "BEGIN SELECT RAISE(ABORT, 'rejected by a constraint'); END"
+            ))
+
+        async with AsyncSession(db_engine) as session:
+            report = await BookImporter().import_stream(body(), "ndjson", str(user.uid), session)
+
+        async with AsyncSession(db_engine) as session:
+            titles = (await session.execute(select(Book.title))).scalars().all()
+
+        return report, titles
+
+    report, titles = asyncio.run(run())
+
+    assert report["inserted"] == 9
+    assert sorted(titles) == sorted(f"Dune {i}" for i in range(1, 11) if i != 7)
+    assert {error["row"]: error["errors"][0]["type"] for error in report["errors"]} == {
+        7: "database_error",
+        11: "less_than_equal",
+    }
+
+
+def test_export_resumes_after_the_last_uid_received(db_engine, add_user_with_books, monkeypatch):
+    from src.books import exporter
+
+    monkeypatch.setattr(exporter, "async_engine", db_engine)
+    monkeypatch.setattr(exporter, "EXPORT_BATCH_SIZE", 2)
+
+    async def export(**options):
+        return "".join([chunk async for chunk in exporter.stream_books("csv", **options)])
+
+    async def run():
+        user, books = await add_user_with_books(5)
+
+        async with AsyncSession(db_engine) as session:
+            session.add_all([
+                Review(rating=rating, review_text="...", user_uid=user.uid, book_uid=books[0].uid)
+                for rating in (2, 4)
+            ])
+            await session.commit()
+
+        full = list(csv.reader(io.StringIO(await export(include_reviews=True))))
+        resumed = list(csv.reader(io.StringIO(await export(after=uuid.UUID(full[2][0])))))
+        empty = await export(after=uuid.UUID(full[-1][0]))
+
+        return books, full, resumed, empty
+
+    books, full, resumed, empty = asyncio.run(run())
+
+    # one header, however many batches the cursor returns
+    assert full[0] == exporter.BOOK_FIELDS + ["review_count", "average_rating"]
+    assert [row[0] for row in full[1:]] == sorted(str(book.uid) for book in books)
+    reviewed = next(row for row in full[1:] if row[0] == str(books[0].uid))
+    assert reviewed[-2:] == ["2", "3.0"]
+
+    assert resumed[0] == exporter.BOOK_FIELDS
+    assert [row[0] for row in resumed[1:]] == [row[0] for row in full[3:]]
+    assert empty == ",".join(exporter.BOOK_FIELDS) + "\n"
+
+
+def test_export_formats_tags():
+    from src.books.exporter import format_csv, format_ndjson
+
+    # the tag aggregate is Postgres' array_agg, so format the rows it returns
+    columns = ["title", "tags"]
+    rows = [("Dune", ["classic", "scifi"]), ("Emma", None)]
+
+    assert format_csv(rows, columns, write_header=True) == "title,tags\nDune,classic|scifi\nEmma,\n"
+    assert [json.loads(line) for line in format_ndjson(rows, columns, write_header=True).splitlines()] == [
+        {"title": "Dune", "tags": ["classic", "scifi"]},
+        {"title": "Emma", "tags": []},
+    ]
+
+
+@pytest.fixture
+def sqlite_search(db_engine, monkeypatch):
+    """Stand-ins for Postgres full-text search on the SQLite test database
+
+    A book's search_vector is its lowercased title, and its rank is a third
+    of the times the query word appears in it, so ranks tie.
+    """
+
+    from sqlalchemy import event, text
+    from sqlalchemy.dialects.sqlite.base import SQLiteCompiler
+
+    def register(dbapi_connection, connection_record):
+        dbapi_connection.create_function("websearch_to_tsquery", 2, lambda config, query: query)
+        dbapi_connection.create_function(
+            "ts_rank", 2, lambda vector, query: vector.split().count(query) / 3
+        )
+        # `vector MATCH query` calls match(query, vector)
+        dbapi_connection.create_function("match", 2, lambda query, vector: query in vector.split())
+
+    def visit_custom_op_binary(self, element, operator, **kw):
+        if operator.opstring == "@@":
+            return self._generate_generic_binary(element, " MATCH ", **kw)
+        return default_visit(self, element, operator, **kw)
+
+    default_visit = SQLiteCompiler.visit_custom_op_binary
+    monkeypatch.setattr(SQLiteCompiler, "visit_custom_op_binary", visit_custom_op_binary)
+    event.listen(db_engine.sync_engine, "connect", register)
+
+    async def add_column():
+        async with db_engine.begin() as conn:
+            await conn.execute(text("ALTER TABLE books ADD COLUMN search_vector TEXT"))
+
+    asyncio.run(add_column())
+    yield
+    event.remove(db_engine.sync_engine, "connect", register)
+
+
+def test_search_pages_through_tied_ranks_without_duplicates_or_gaps(db_engine, add_user_with_books, sqlite_search):
+    from sqlalchemy import text
+
+    async def run():
+        _, books = await add_user_with_books(15)
+
+        async with db_engine.begin() as conn:
+            for i, book in enumerate(books):
+                # ranks 1/3, 2/3 and 1 among the first twelve; the rest never match
+                title = "Dune " * (i % 3 + 1) + str(i) if i < 12 else f"Emma {i}"
+                await conn.execute(
+                    text("UPDATE books SET title = :title, search_vector = lower(:title) WHERE uid = :uid"),
+                    {"title": title, "uid": book.uid.hex},
+                )
+
+        pages = []
+        cursor = None
+        async with AsyncSession(db_engine) as session:
+            while True:
+                page = await BookService().search_books("dune", session, limit=5, cursor=cursor)
+                pages.append(page["items"])
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    return books, pages
+
+    books, pages = asyncio.run(run())
+    found = [item["title"] for page in pages for item in page]
+
+    assert [len(page) for page in pages] == [5, 5, 2]
+    assert sorted(found) == sorted(
+        "Dune " * (i % 3 + 1) + str(i) for i in range(12)
+    )
+    # best match first
+    assert [title.count("Dune") for title in found] == [3] * 4 + [2] * 4 + [1] * 4
+
+
+def test_filter_matches_all_or_any_tag_with_facets_over_the_result(db_engine, add_user_with_books, monkeypatch):
+    from src.tags.service import TagService
+
+    monkeypatch.setattr(Config, "CACHE_ENABLED", False)
+
+    async def run():
+        _, books = await add_user_with_books(4)
+        scifi_classic, scifi, classic_desert, _ = [book.uid for book in books]
+
+        async with AsyncSession(db_engine) as session:
+            await TagService()._tag_books([scifi_classic, scifi], ["scifi"], session)
+            await TagService()._tag_books([scifi_classic, classic_desert], ["classic"], session)
+            await TagService()._tag_books([classic_desert], ["desert"], session)
+
+        async with AsyncSession(db_engine) as session:
+            service = BookService()
+            every = await service.filter_books_by_tags(["scifi", "classic"], "all", session)
+            # the facets count the whole result, not just the first page
+            some = await service.filter_books_by_tags(["scifi", "classic"], "any", session, limit=2)
+            rest = await service.filter_books_by_tags(
+                ["scifi", "classic"], "any", session, limit=2, cursor=some["next_cursor"]
+            )
+
+        return every, some, rest
+
+    every, some, rest = asyncio.run(run())
+
+    assert [item["title"] for item in every["items"]] == ["Dune 0"]
+    assert every["facets"] == [{"name": "classic", "count": 1}, {"name": "scifi", "count": 1}]
+
+    assert sorted(item["title"] for item in some["items"] + rest["items"]) == ["Dune 0", "Dune 1", "Dune 2"]
+    assert rest["next_cursor"] is None
+    assert some["facets"] == [
+        {"name": "classic", "count": 2},
+        {"name": "scifi", "count": 2},
+        {"name": "desert", "count": 1},
+    ]
+
+
+def test_rescoring_invalidates_each_rewritten_book(db_engine, add_user_with_books, monkeypatch, capsys):
+    from src.db import cache, main as db_main
+    from src.reviews import ratings
+
+    invalidated = []
+
+    async def invalidate_tags(*tags):
+        invalidated.extend(tags)
+
+    monkeypatch.setattr(db_main, "async_engine", db_engine)
+    monkeypatch.setattr(cache, "invalidate_tags", invalidate_tags)
+
+    async def run():
+        user, (reviewed, stale, untouched) = await add_user_with_books(3)
+
+        async with AsyncSession(db_engine) as session:
+            # a review the aggregates never counted, and a score without reviews
+            session.add(Review(rating=5, review_text="...", user_uid=user.uid, book_uid=reviewed.uid))
+            (await session.get(Book, stale.uid)).rating_score = 4.5
+            await session.commit()
+
+        await ratings.main()
+        return reviewed, stale, untouched
+
+    reviewed, stale, untouched = asyncio.run(run())
+
+    assert sorted(invalidated) == sorted(
+        ["books", f"book:{reviewed.uid}", f"book:{stale.uid}"]
+    )
+    assert json.loads(capsys.readouterr().out)["books_updated"] == 2
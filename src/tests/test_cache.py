@@ -0,0 +1,176 @@
+import asyncio
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.books.schemas import BookCreateModel, BookUpdateModel
+from src.books.service import BookService
+from src.config import Config
+from src.db import cache
+
+
+class FakeRedis:
+    """The commands the cache uses, in memory; `down` fails every call"""
+
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+        self.down = False
+
+    def _check(self):
+        if self.down:
+            raise RedisConnectionError("connection refused")
+
+    async def get(self, name):
+        self._check()
+        return self.values.get(name)
+
+    async def mget(self, names):
+        self._check()
+        return [self.values.get(name) for name in names]
+
+    async def set(self, name, value, ex=None, nx=False):
+        self._check()
+        if nx and name in self.values:
+            return None
+        self.values[name] = str(value)
+        return True
+
+    async def sadd(self, name, *members):
+        self.sets.setdefault(name, set()).update(members)
+
+    async def smembers(self, name):
+        return set(self.sets.get(name, ()))
+
+    async def expire(self, name, seconds):
+        pass
+
+    async def delete(self, *names):
+        for name in names:
+            self.values.pop(name, None)
+            self.sets.pop(name, None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+        return queue
+
+    async def execute(self):
+        self.redis._check()
+        return [
+            await getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.commands
+        ]
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(cache, "redis_client", fake)
+    monkeypatch.setattr(cache, "_failed_invalidations", set())
+    monkeypatch.setattr(cache, "INVALIDATION_RETRY_INTERVAL", 0)
+    monkeypatch.setattr(Config, "CACHE_ENABLED", True)
+    return fake
+
+
+def test_fill_racing_an_invalidation_is_not_served(redis):
+    rows = {"title": "Dune"}
+
+    async def run():
+        async def stale_loader():
+            loaded = dict(rows)
+            # a write commits and invalidates while this fill is loading
+            rows["title"] = "Dune Messiah"
+            await cache.invalidate_tags("book:1")
+            return loaded
+
+        async def loader():
+            return dict(rows)
+
+        assert await cache.read_through("book:1", ["book:1"], stale_loader) == {"title": "Dune"}
+
+        # the entry was stored under the version before the write
+        assert await cache.read_through("book:1", ["book:1"], loader) == {"title": "Dune Messiah"}
+        assert await cache.read_through("book:1", ["book:1"], stale_loader) == {"title": "Dune Messiah"}
+
+    asyncio.run(run())
+
+
+def test_failed_invalidation_is_retried_before_serving(redis):
+    async def run():
+        title = ["Dune"]
+
+        async def loader():
+            return {"title": title[0]}
+
+        await cache.read_through("book:1", ["book:1"], loader)
+        versions = await cache.tag_versions("book:1")
+
+        redis.down = True
+        title[0] = "Dune Messiah"
+        await cache.invalidate_tags("book:1")
+        redis.down = False
+
+        # nothing reached Redis, but this worker retries before it reads
+        assert await cache.read_through("book:1", ["book:1"], loader) == {"title": "Dune Messiah"}
+        assert await cache.tag_versions("book:1") != versions
+        assert cache._failed_invalidations == set()
+
+    asyncio.run(run())
+
+
+def test_writes_invalidate_cached_books(redis, db_engine, add_user_with_books):
+    service = BookService()
+
+    async def run():
+        user, (book,) = await add_user_with_books()
+
+        async with AsyncSession(db_engine, expire_on_commit=False) as session:
+            page = await service.get_all_books(session)
+            detail = await service.get_book_detail(book.uid, session)
+            assert [item["title"] for item in page["items"]] == ["Dune"]
+            assert detail["title"] == "Dune"
+
+            await service.create_book(
+                BookCreateModel(
+                    title="Children of Dune", author="Frank Herbert", publisher="Putnam",
+                    published_date="1976-04-01", page_count=444, language="en",
+                ),
+                user.uid,
+                session,
+            )
+            page = await service.get_all_books(session)
+            assert sorted(item["title"] for item in page["items"]) == ["Children of Dune", "Dune"]
+
+            await service.update_book(
+                book.uid,
+                BookUpdateModel(
+                    title="Dune (revised)", author="Frank Herbert", publisher="Chilton",
+                    page_count=412, language="en",
+                ),
+                session,
+            )
+            assert (await service.get_book_detail(book.uid, session))["title"] == "Dune (revised)"
+
+            await service.delete_book(book.uid, session)
+            assert await service.get_book_detail(book.uid, session) is None
+            page = await service.get_all_books(session)
+            assert [item["title"] for item in page["items"]] == ["Children of Dune"]
+
+    asyncio.run(run())
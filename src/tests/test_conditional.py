@@ -0,0 +1,110 @@
+import asyncio
+
+from fastapi import Request, Response
+
+from src import conditional
+
+
+def make_request(headers: dict) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/api/v1/tags/",
+        "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    })
+
+
+def test_matching_etag_skips_the_loader(monkeypatch):
+    calls = []
+
+    versions = [1735689600_500_000_000]
+
+    async def tag_versions(*tags):
+        return versions
+
+    async def loader():
+        calls.append(1)
+        return [{"name": "fiction"}]
+
+    monkeypatch.setattr(conditional, "tag_versions", tag_versions)
+
+    async def get(headers):
+        response = Response()
+        body = await conditional.conditional_get(make_request(headers), response, ["tags"], loader)
+        return body, response
+
+    body, response = asyncio.run(get({}))
+    etag = response.headers["ETag"]
+
+    assert body == [{"name": "fiction"}]
+    assert response.headers["Last-Modified"] == "Wed, 01 Jan 2025 00:00:01 GMT"
+
+    not_modified, _ = asyncio.run(get({"If-None-Match": etag}))
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+
+    not_modified, _ = asyncio.run(get({"If-Modified-Since": "Wed, 01 Jan 2025 00:00:01 GMT"}))
+    assert not_modified.status_code == 304
+
+    assert len(calls) == 1
+
+    # a write in the second the client holds
+    versions[0] = 1735689601_200_000_000
+    body, _ = asyncio.run(get({"If-Modified-Since": "Wed, 01 Jan 2025 00:00:01 GMT"}))
+    assert body == [{"name": "fiction"}]
+
+
+def test_any_etag_needs_an_existing_resource(monkeypatch):
+    async def tag_versions(*tags):
+        return [1735689600_500_000_000]
+
+    async def missing():
+        return None
+
+    async def found():
+        return {"title": "Dune"}
+
+    monkeypatch.setattr(conditional, "tag_versions", tag_versions)
+    request = make_request({"If-None-Match": "*"})
+
+    assert asyncio.run(conditional.conditional_get(request, Response(), ["book:1"], missing)) is None
+
+    result = asyncio.run(conditional.conditional_get(request, Response(), ["book:1"], found))
+    assert result.status_code == 304
+
+
+def test_body_hash_without_cache(monkeypatch):
+    async def tag_versions(*tags):
+        return None
+
+    async def loader():
+        return {"uid": "1", "title": "Dune"}
+
+    monkeypatch.setattr(conditional, "tag_versions", tag_versions)
+
+    etag = conditional.body_validators({"title": "Dune", "uid": "1"}).etag
+    result = asyncio.run(
+        conditional.conditional_get(make_request({"If-None-Match": etag}), Response(), ["book:1"], loader)
+    )
+
+    assert result.status_code == 304
+
+
+def test_replica_reads_get_body_hash_etags(monkeypatch):
+    from types import SimpleNamespace
+
+    async def tag_versions(*tags):
+        raise AssertionError("versions may be newer than a replica's rows")
+
+    async def loader():
+        return [{"name": "fiction"}]
+
+    monkeypatch.setattr(conditional, "tag_versions", tag_versions)
+
+    response = Response()
+    replica = SimpleNamespace(info={"replica": 0})
+    asyncio.run(conditional.conditional_get(make_request({}), response, ["tags"], loader, session=replica))
+
+    assert response.headers["ETag"] == conditional.body_validators([{"name": "fiction"}]).etag
+    assert "Last-Modified" not in response.headers
@@ -0,0 +1,44 @@
+import io
+import json
+
+from src.logs import start_logging, stop_logging
+
+
+def test_access_log_is_json_with_request_id(test_client):
+    stream = io.StringIO()
+    start_logging(stream)
+
+    try:
+        response = test_client.get(
+            "/api/v1/books/0a3e52d4-5b1d-4b8e-9c3f-2f1f8f1d6d11",
+            headers={"host": "localhost", "X-Request-ID": "abc123"},
+        )
+    finally:
+        # flushes the queue before returning
+        stop_logging()
+
+    entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+    access = [entry for entry in entries if entry["logger"] == "bookly.access"]
+
+    assert response.headers["X-Request-ID"] == "abc123"
+    assert access[-1]["request_id"] == "abc123"
+    assert access[-1]["route"] == "/api/v1/books/{book_uid}"
+    assert access[-1]["status"] == response.status_code
+
+
+def test_module_loggers_share_the_json_output():
+    import logging
+
+    stream = io.StringIO()
+    start_logging(stream)
+
+    try:
+        logging.getLogger("src.db.cache").warning("cache read failed for %s: %s", "k", "down")
+    finally:
+        stop_logging()
+
+    entry, = [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    assert entry["logger"] == "src.db.cache"
+    assert entry["level"] == "WARNING"
+    assert entry["message"] == "cache read failed for k: down"
@@ -0,0 +1,11 @@
+def test_metrics_label_requests_by_route_template(test_client):
+    headers = {"host": "localhost"}
+
+    test_client.get("/api/v1/books/0a3e52d4-5b1d-4b8e-9c3f-2f1f8f1d6d11", headers=headers)
+    test_client.get("/no/such/path", headers=headers)
+
+    metrics = test_client.get("/metrics", headers=headers).text
+
+    assert 'route="/api/v1/books/{book_uid}"' in metrics
+    assert 'route="unmatched",status="404"' in metrics
+    assert "0a3e52d4" not in metrics
@@ -0,0 +1,114 @@
+import asyncio
+import io
+import json
+
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from src.config import Config
+from src.logs import start_logging, stop_logging
+from src.middleware import ObserveRequestsMiddleware, QueryStatsMiddleware, ReadYourWritesMiddleware
+
+
+def http_scope():
+    return {
+        "type": "http", "method": "GET", "path": "/export", "raw_path": b"/export",
+        "query_string": b"", "headers": [], "client": ("127.0.0.1", 1234),
+    }
+
+
+def test_streamed_chunks_pass_through_unbuffered():
+    async def run():
+        first_chunk_sent = asyncio.Event()
+        messages = []
+
+        async def streaming_app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"first", "more_body": True})
+            # a buffering middleware would hold the first chunk until the body ends
+            await asyncio.wait_for(first_chunk_sent.wait(), timeout=1)
+            await send({"type": "http.response.body", "body": b"second", "more_body": False})
+
+        async def send(message):
+            messages.append(message)
+            if message.get("body") == b"first":
+                first_chunk_sent.set()
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        stack = ObserveRequestsMiddleware(ReadYourWritesMiddleware(QueryStatsMiddleware(streaming_app)))
+        await stack(http_scope(), receive, send)
+
+        return messages
+
+    start, *body = asyncio.run(run())
+
+    assert [message["body"] for message in body] == [b"first", b"second"]
+    headers = dict(start["headers"])
+    assert headers[b"x-request-id"]
+    assert headers[b"x-query-count"] == b"0"
+
+
+def route_app() -> FastAPI:
+    router = APIRouter()
+
+    @router.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"item_id": item_id}
+
+    @router.get("/items/{item_id}/stream")
+    async def stream_item(item_id: int):
+        async def chunks():
+            yield "a"
+            yield "b"
+
+        return StreamingResponse(chunks())
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    app.add_middleware(ObserveRequestsMiddleware)
+    return app
+
+
+def test_request_id_is_set_on_normal_and_error_responses():
+    client = TestClient(route_app())
+
+    forwarded = client.get("/api/items/1", headers={"X-Request-ID": "abc123"})
+    generated = client.get("/api/items/1")
+    invalid = client.get("/api/items/not-a-number", headers={"X-Request-ID": "abc123"})
+    missing = client.get("/no/such/path")
+
+    assert forwarded.status_code == generated.status_code == 200
+    assert forwarded.headers["X-Request-ID"] == "abc123"
+    assert len(generated.headers["X-Request-ID"]) == 32
+
+    assert invalid.status_code == 422
+    assert invalid.headers["X-Request-ID"] == "abc123"
+    assert missing.status_code == 404
+    assert missing.headers["X-Request-ID"]
+
+
+def test_access_log_records_the_route_template(monkeypatch):
+    monkeypatch.setattr(Config, "ACCESS_LOG_SAMPLE_RATE", 1.0)
+    client = TestClient(route_app())
+    stream = io.StringIO()
+    start_logging(stream)
+
+    try:
+        client.get("/api/items/1")
+        streamed = client.get("/api/items/2/stream")
+        client.get("/no/such/path")
+    finally:
+        stop_logging()
+
+    entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+    access = [entry for entry in entries if entry["logger"] == "bookly.access"]
+
+    assert streamed.text == "ab"
+    assert [(entry["route"], entry["path"], entry["status"]) for entry in access] == [
+        ("/api/items/{item_id}", "/api/items/1", 200),
+        ("/api/items/{item_id}/stream", "/api/items/2/stream", 200),
+        ("unmatched", "/no/such/path", 404),
+    ]
@@ -0,0 +1,171 @@
+import asyncio
+import socket
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.db.models import EmailOutbox
+from src.outbox import OutboxWorker, SMTPSender
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+pytest.importorskip("aiosqlite")
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_sender(port: int) -> SMTPSender:
+    return SMTPSender(
+        hostname="127.0.0.1", port=port, from_address="bookly@example.com",
+        from_name="Bookly", start_tls=False,
+    )
+
+
+async def make_session_factory():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    return engine, sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def queue(session_factory, count: int):
+    async with session_factory() as session:
+        for i in range(count):
+            session.add(EmailOutbox(
+                recipients=[f"user{i}@example.com"], subject=f"Hello {i}", body="<h1>Hi</h1>"
+            ))
+        await session.commit()
+
+
+async def statuses(session_factory):
+    async with session_factory() as session:
+        result = await session.execute(select(EmailOutbox))
+        return result.scalars().all()
+
+
+def test_outbox_sends_batch_over_one_connection():
+    handler = RecordingHandler()
+    controller = aiosmtpd_controller.Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+
+    async def run():
+        engine, session_factory = await make_session_factory()
+        await queue(session_factory, 3)
+
+        sender = make_sender(controller.port)
+        worker = OutboxWorker(session_factory, sender)
+
+        assert await worker.run_once() == 3
+        await sender.close()
+
+        assert sender.connections == 1
+        assert {m.status for m in await statuses(session_factory)} == {"sent"}
+        await engine.dispose()
+
+    try:
+        asyncio.run(run())
+    finally:
+        controller.stop()
+
+    assert sorted(m.rcpt_tos[0] for m in handler.messages) == [
+        "user0@example.com", "user1@example.com", "user2@example.com"
+    ]
+
+
+def test_outbox_backs_off_when_smtp_is_down():
+    async def run():
+        engine, session_factory = await make_session_factory()
+        await queue(session_factory, 1)
+
+        worker = OutboxWorker(session_factory, make_sender(free_port()))
+
+        assert await worker.run_once() == 1
+
+        message, = await statuses(session_factory)
+        assert message.status == "pending"
+        assert message.attempts == 1
+        assert message.last_error
+        assert message.next_attempt_at > datetime.now()
+
+        # not due yet, so the next batch leaves it alone
+        assert await worker.run_once() == 0
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_claimed_messages_wait_for_their_lease():
+    async def run():
+        engine, session_factory = await make_session_factory()
+        await queue(session_factory, 1)
+
+        worker = OutboxWorker(session_factory, make_sender(free_port()))
+
+        # a worker that died after claiming, before it could record anything
+        claimed, = await worker.claim()
+        assert claimed.status == "sending"
+        assert await worker.claim() == []
+
+        async with session_factory() as session:
+            message = await session.get(EmailOutbox, claimed.uid)
+            message.next_attempt_at = datetime.now()
+            await session.commit()
+
+        assert len(await worker.claim()) == 1
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_messages_commit_and_roll_back_with_their_transaction():
+    from src.auth.schemas import UserCreateModel
+    from src.auth.service import UserService
+    from src.db.models import User
+    from src.outbox import enqueue_message
+
+    signup = UserCreateModel(
+        username="hasan202", email="hasanakash799@gmail.com", first_name="jahid",
+        last_name="hasan", password="jahidhasan",
+    )
+
+    async def run():
+        engine, session_factory = await make_session_factory()
+
+        async with session_factory() as session:
+            await UserService().create_user(signup, session)
+            await enqueue_message([signup.email], "Verify", "<p>link</p>", session)
+            # e.g. the request failed before its commit
+            await session.rollback()
+
+        assert await statuses(session_factory) == []
+
+        async with session_factory() as session:
+            await UserService().create_user(signup, session)
+            await enqueue_message([signup.email], "Verify", "<p>link</p>", session)
+            await session.commit()
+
+        async with session_factory() as session:
+            users = (await session.execute(select(User))).scalars().all()
+
+        assert [user.email for user in users] == [signup.email]
+        assert [m.status for m in await statuses(session_factory)] == ["pending"]
+        await engine.dispose()
+
+    asyncio.run(run())
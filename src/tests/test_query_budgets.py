@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.auth.cache import principal_cache
+from src.auth.utils import create_access_token
+from src.config import Config
+from src.db.models import Review, Tag
+from src.db.redis import blocklist_mirror
+
+# statements per request, authentication included; the principal is not
+# cached yet and neither are the responses
+ENDPOINT_BUDGETS = {
+    # principal, page
+    "GET /api/v1/books/": 2,
+    # principal, book, its tags, review preview
+    "GET /api/v1/books/{book_uid}": 4,
+    # principal, user, books, reviews
+    "GET /api/v1/auth/me": 4,
+}
+
+
+@pytest.fixture
+def signed_in(app_db, add_user_with_books, monkeypatch):
+    """A verified user with a book and reviews, and their access token"""
+
+    monkeypatch.setattr(Config, "CACHE_ENABLED", False)
+    # an empty blocklist, without Redis
+    monkeypatch.setattr(blocklist_mirror, "synced", True)
+
+    async def setup():
+        user, (book,) = await add_user_with_books(tags=[Tag(name="scifi")])
+
+        async with AsyncSession(app_db, expire_on_commit=False) as session:
+            user.is_verified = True
+            session.add(user)
+            session.add_all([
+                Review(rating=4, review_text="...", user_uid=user.uid, book_uid=book.uid)
+                for _ in range(30)
+            ])
+            await session.commit()
+
+        return user, book
+
+    user, book = asyncio.run(setup())
+    token = create_access_token(
+        user_data={"email": user.email, "user_uid": str(user.uid), "role": user.role}
+    )
+
+    yield {"Authorization": f"Bearer {token}"}, book
+    principal_cache.clear()
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINT_BUDGETS)
+def test_endpoint_query_budget(endpoint, counting_client, signed_in):
+    headers, book = signed_in
+    method, path = endpoint.split(" ")
+    principal_cache.clear()
+
+    response = counting_client.request(method, path.format(book_uid=book.uid), headers=headers)
+
+    assert response.status_code == 200
+    assert int(response.headers["X-Query-Count"]) <= ENDPOINT_BUDGETS[endpoint], (
+        f"{endpoint} ran {response.headers['X-Query-Count']} queries, "
+        f"the budget is {ENDPOINT_BUDGETS[endpoint]}"
+    )
@@ -0,0 +1,70 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import pytest
+
+from src.db.replicas import ReadRouter
+
+
+def session_factory(url):
+    engine = create_async_engine(url)
+    return engine, sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def test_read_router_balances_and_falls_back(tmp_path):
+    pytest.importorskip("aiosqlite")
+
+    async def run():
+        primary, primary_factory = session_factory(f"sqlite+aiosqlite:///{tmp_path}/primary.db")
+        first, first_factory = session_factory(f"sqlite+aiosqlite:///{tmp_path}/first.db")
+        second, second_factory = session_factory(f"sqlite+aiosqlite:///{tmp_path}/second.db")
+        # a replica that cannot be reached
+        broken, broken_factory = session_factory(f"sqlite+aiosqlite:///{tmp_path}/missing/x.db")
+
+        async def targets(router, count, **kwargs):
+            picked = []
+            for _ in range(count):
+                async with await router.open_session(**kwargs) as session:
+                    picked.append(session.info.get("replica", "primary"))
+            return picked
+
+        router = ReadRouter(primary_factory, [first_factory, second_factory], retry_after=30)
+        assert await targets(router, 4) == [0, 1, 0, 1]
+        assert await targets(router, 2, use_primary=True) == ["primary", "primary"]
+
+        router = ReadRouter(primary_factory, [broken_factory, second_factory], retry_after=30)
+        # the broken replica is tried once, then skipped until retry_after passes
+        assert await targets(router, 3) == [1, 1, 1]
+
+        router = ReadRouter(primary_factory, [broken_factory], retry_after=30)
+        assert await targets(router, 2) == ["primary", "primary"]
+
+        for engine in (primary, first, second, broken):
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+
+def test_replica_reads_are_not_cached(monkeypatch):
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock, MagicMock
+
+    from src.db import cache
+
+    redis = MagicMock()
+    redis.mget = AsyncMock(return_value=[None, None])
+    monkeypatch.setattr(cache, "redis_client", redis)
+    monkeypatch.setattr(cache.Config, "CACHE_ENABLED", True)
+
+    async def loader():
+        return {"title": "Dune"}
+
+    replica = SimpleNamespace(info={"replica": 0})
+    value = asyncio.run(cache.read_through("book:1", ["book:1"], loader, session=replica))
+
+    assert value == {"title": "Dune"}
+    redis.pipeline.assert_not_called()
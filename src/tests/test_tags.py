@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import Config
+from src.db.models import BookTag, Tag
+from src.tags.service import TagService
+
+tags_prefix = f'/api/v1/tags'
+
+
+async def count_rows(engine, model) -> int:
+    async with AsyncSession(engine) as session:
+        result = await session.exec(select(func.count()).select_from(model))
+        return result.one()
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(Config, "CACHE_ENABLED", False)
+
+
+def test_upsert_tags_returns_existing_and_new_tags(db_engine):
+    async def run():
+        async with AsyncSession(db_engine) as session:
+            first = await TagService().upsert_tags(["scifi", "classic"], session)
+            await session.commit()
+
+            second = await TagService().upsert_tags(["classic", "scifi", "desert", "scifi"], session)
+            await session.commit()
+
+        assert set(second) == {"classic", "desert", "scifi"}
+        assert second["scifi"] == first["scifi"]
+        assert second["classic"] == first["classic"]
+        assert await count_rows(db_engine, Tag) == 3
+
+    asyncio.run(run())
+
+
+def test_tagging_twice_adds_no_duplicate_links(db_engine, add_user_with_books):
+    async def run():
+        _, books = await add_user_with_books(2)
+        book_uids = [book.uid for book in books]
+
+        async with AsyncSession(db_engine) as session:
+            await TagService()._tag_books(book_uids[:1], ["scifi"], session)
+            # one link already exists, and the same book is listed twice
+            await TagService()._tag_books(book_uids + book_uids[:1], ["scifi", "classic"], session)
+
+        assert await count_rows(db_engine, BookTag) == 4
+        assert await count_rows(db_engine, Tag) == 2
+
+    asyncio.run(run())
+
+
+def test_tag_many_books_endpoint(test_client, app_db, add_user_with_books, monkeypatch):
+    from src import app
+    from src.tags import routes as tag_routes
+
+    _, books = asyncio.run(add_user_with_books(3))
+    book_uids = [str(book.uid) for book in books]
+    monkeypatch.setitem(app.dependency_overrides, tag_routes.user_role_checker.dependency, lambda: True)
+
+    def tag(uids, names):
+        return test_client.post(
+            f"{tags_prefix}/books",
+            json={"book_uids": uids, "tags": [{"name": n} for n in names]},
+            headers={"host": "localhost"},
+        )
+
+    first = tag(book_uids, ["scifi"])
+    second = tag(book_uids, ["scifi", "classic"])
+    missing = tag([book_uids[0], "0a3e52d4-5b1d-4b8e-9c3f-2f1f8f1d6d11"], ["scifi"])
+
+    assert first.status_code == second.status_code == 200
+    assert second.json()["tagged_books"] == 3
+    assert sorted(tag["name"] for tag in second.json()["tags"]) == ["classic", "scifi"]
+    assert missing.status_code == 404
+
+    assert asyncio.run(count_rows(app_db, BookTag)) == 6